@@ -1,14 +1,14 @@
 import logging
-import random
 
 from PySide2 import QtWidgets, QtCore
 from shiboken2 import wrapInstance
 import maya.OpenMayaUI as omui
-import maya.cmds as cmds
 import pymel.core as pmc
 from pymel.core.system import Path
 import os
 
+from scatter_object import ScatterObject
+
 log = logging.getLogger(__name__)
 
 
@@ -26,9 +26,10 @@ class ScatterUI(QtWidgets.QDialog):
         self.setWindowTitle("Scatter Tool")
         self.setMinimumWidth(500)
         self.setMaximumWidth(1000)
-        self.setMaximumHeight(370)
+        self.setMaximumHeight(680)
         self.setWindowFlags(self.windowFlags() ^
                             QtCore.Qt.WindowContextHelpButtonHint)
+        self.scatterobject = ScatterObject()
         self.create_ui()
         self.create_connections()
 
@@ -41,10 +42,15 @@ class ScatterUI(QtWidgets.QDialog):
         layout.addLayout(self.xrot_rand_lay)
         layout.addLayout(self.yrot_rand_lay)
         layout.addLayout(self.zrot_rand_lay)
-         layout.addLayout(self.xscale_rand_lay)
+        layout.addLayout(self.xscale_rand_lay)
         layout.addLayout(self.yscale_rand_lay)
         layout.addLayout(self.zscale_rand_lay)
         layout.addLayout(self.selected_vert_perc_rand_lay)
+        layout.addLayout(self.sampling_lay)
+        layout.addLayout(self.variant_weights_lay)
+        layout.addLayout(self.overlap_lay)
+        layout.addLayout(self.density_mask_lay)
+        layout.addLayout(self.camera_lay)
         layout.addStretch()
         layout.addLayout(self.bottom_button_rand_lay)
         return layout
@@ -61,12 +67,17 @@ class ScatterUI(QtWidgets.QDialog):
         self.yscale_rand_lay.setRowMinimumHeight(0, 20)
         self.zscale_rand_lay.setRowMinimumHeight(0, 20)
         self.selected_vert_perc_rand_lay.setRowMinimumHeight(0, 40)
+        self.sampling_lay.setRowMinimumHeight(0, 20)
+        self.variant_weights_lay.setRowMinimumHeight(0, 20)
+        self.overlap_lay.setRowMinimumHeight(0, 20)
+        self.density_mask_lay.setRowMinimumHeight(0, 40)
+        self.camera_lay.setRowMinimumHeight(0, 40)
         self.bottom_button_rand_lay.setRowMinimumHeight(0, 20)
         self.setLayout(main_lay)
         return main_lay
     
 
-         def layout_creation(self):
+    def layout_creation(self):
         """Assigns variable names to method calls"""
         self.scatter_field_lay = self._create_scatter_field_ui()
         self.align_to_normals_lay = self._create_align_to_normals_ui()
@@ -78,15 +89,26 @@ class ScatterUI(QtWidgets.QDialog):
         self.zscale_rand_lay = self._create_zscale_rand_field_ui()
         self.selected_vert_perc_rand_lay = \
             self._create_selected_vert_percentage_ui()
+        self.sampling_lay = self._create_sampling_ui()
+        self.variant_weights_lay = self._create_variant_weights_ui()
+        self.overlap_lay = self._create_overlap_ui()
+        self.density_mask_lay = self._create_density_mask_ui()
+        self.camera_lay = self._create_camera_ui()
         self.bottom_button_rand_lay = self._create_bottom_buttons_ui()
 
     def create_connections(self):
         """Connects Signals and Slots"""
 
-         self.scatter_btn.clicked.connect(self._scatter_click)
+        self.scatter_btn.clicked.connect(self._scatter_click)
         self.reset_btn.clicked.connect(self._reset_click)
+        self.export_btn.clicked.connect(self._export_layout_click)
+        self.import_btn.clicked.connect(self._import_layout_click)
         self.scatter_obj_pb.clicked.connect(self._select_scatter_object_click)
         self.scatter_targ_pb.clicked.connect(self._select_scatter_target_click)
+        self.camera_pb.clicked.connect(self._select_camera_click)
+        self.follow_target.toggled.connect(self._follow_target_toggled)
+        self.update_attached_btn.clicked.connect(
+            self._update_attached_click)
         self.align_to_normals.clicked.connect(self._align_to_normals_click)
         self.align_to_normals_and_rotation.clicked.connect(
             self._align_to_normals_and_random_rotate_click)
@@ -99,6 +121,21 @@ class ScatterUI(QtWidgets.QDialog):
         """Sets scatter object to name of last selected object"""
         self._set_selected_scatter_target()
     @QtCore.Slot()
+    def _select_camera_click(self):
+        """Sets the culling camera to the last selected object"""
+        self.scatterobject.select_camera()
+        self.camera.setText(self.scatterobject.camera or "")
+    @QtCore.Slot(bool)
+    def _follow_target_toggled(self, checked):
+        """Keeps the scattered instances on the target as it deforms"""
+        self.scatterobject.follow_target(checked)
+    @QtCore.Slot()
+    def _update_attached_click(self):
+        """Moves the scattered instances onto the target's current shape"""
+        if not self.scatterobject.update_attached_instances():
+            log.warning("Nothing to update, scatter first and then try "
+                        "again.")
+    @QtCore.Slot()
     def _align_to_normals_click(self):
         """Aligns to normals when box is checked"""
         self._set_align_to_normals_values()
@@ -117,11 +154,45 @@ class ScatterUI(QtWidgets.QDialog):
                         "Selected. Select a Scatter Object to fix this.")
         else:
             self._set_scatterobject_properties_from_ui()
-            self.scatterobject.scatter_check()
+            if self.scatterobject.plan_check():
+                self._run_with_progress(self.scatterobject.scatter_chunks())
     @QtCore.Slot()
     def _reset_click(self):
         """Reset UI values to default"""
         self._reset_scatterobject_properties_from_ui()
+    @QtCore.Slot()
+    def _export_layout_click(self):
+        """Saves the last scatter as a binary layout file"""
+        path = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export Scatter Layout", "", "Scatter Layout (*.scatter)")[0]
+        if path:
+            self.scatterobject.export_layout(path)
+    @QtCore.Slot()
+    def _import_layout_click(self):
+        """Re-instances a binary layout file"""
+        path = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import Scatter Layout", "", "Scatter Layout (*.scatter)")[0]
+        if path:
+            self._run_with_progress(
+                self.scatterobject.import_layout_chunks(path))
+
+    def _run_with_progress(self, chunks):
+        """Runs scatter chunks behind a cancellable progress bar"""
+        progress = QtWidgets.QProgressDialog("Scattering...", "Cancel", 0,
+                                             100, self)
+        progress.setWindowModality(QtCore.Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        try:
+            for done, total in chunks:
+                progress.setValue(int(100.0 * done / max(total, 1)))
+                QtWidgets.QApplication.processEvents()
+                if progress.wasCanceled():
+                    chunks.close()
+                    self.scatterobject.cancel_scatter()
+                    log.warning("Scatter cancelled.")
+                    break
+        finally:
+            progress.close()
 
     def _create_scatter_field_ui(self):
         layout = self._create_scatter_field_headers()
@@ -139,7 +210,7 @@ class ScatterUI(QtWidgets.QDialog):
         layout.addWidget(self.scatter_targ_pb, 1, 4)
         return layout
 
-        def _create_align_to_normals_ui(self):
+    def _create_align_to_normals_ui(self):
         layout = QtWidgets.QGridLayout()
         self.align_to_normals = QtWidgets.QCheckBox("Align to Normals")
         layout.addWidget(self.align_to_normals, 2, 0)
@@ -165,31 +236,38 @@ class ScatterUI(QtWidgets.QDialog):
         layout = QtWidgets.QGridLayout()
         self.x_min_lbl = QtWidgets.QLabel("X Rotation Minimum")
         self.x_max_lbl = QtWidgets.QLabel("X Rotation Maximum")
-        self.xrot_min = QtWidgets.QLineEdit()
-        self.xrot_min.setMinimumWidth(100)
-        self.xrot_max = QtWidgets.QLineEdit()
-        self.xrot_max.setMinimumWidth(100)
+        self._set_xrot_spinbox()
         layout.addWidget(self.x_min_lbl, 1, 0)
         layout.addWidget(self.xrot_min, 2, 0)
         layout.addWidget(self.x_max_lbl, 1, 1)
         layout.addWidget(self.xrot_max, 2, 1)
         return layout
 
+    def _set_xrot_spinbox(self):
+        self.xrot_min = QtWidgets.QSpinBox()
+        self.xrot_min.setMinimum(0)
+        self.xrot_min.setMaximum(360)
+        self.xrot_min.setMinimumWidth(100)
+        self.xrot_min.setSingleStep(10)
+        self.xrot_max = QtWidgets.QSpinBox()
+        self.xrot_max.setMinimum(0)
+        self.xrot_max.setMaximum(360)
+        self.xrot_max.setValue(360)
+        self.xrot_max.setMinimumWidth(100)
+        self.xrot_max.setSingleStep(10)
+
     def _create_yrot_rand_field_ui(self):
         layout = QtWidgets.QGridLayout()
         self.y_min_lbl = QtWidgets.QLabel("Y Rotation Minimum")
         self.y_max_lbl = QtWidgets.QLabel("Y Rotation Maximum")
-        self.yrot_min = QtWidgets.QLineEdit()
-        self.yrot_min.setMinimumWidth(100)
-        self.yrot_max = QtWidgets.QLineEdit()
-        self.yrot_max.setMinimumWidth(100)
+        self._set_yrot_spinbox()
         layout.addWidget(self.y_min_lbl, 3, 0)
         layout.addWidget(self.yrot_min, 4, 0)
         layout.addWidget(self.y_max_lbl, 3, 1)
         layout.addWidget(self.yrot_max, 4, 1)
         return layout
 
-        def _set_yrot_spinbox(self):
+    def _set_yrot_spinbox(self):
         self.yrot_min = QtWidgets.QSpinBox()
         self.yrot_min.setMinimum(0)
         self.yrot_min.setMaximum(360)
@@ -206,17 +284,14 @@ class ScatterUI(QtWidgets.QDialog):
         layout = QtWidgets.QGridLayout()
         self.z_min_lbl = QtWidgets.QLabel("Z Rotation Minimum")
         self.z_max_lbl = QtWidgets.QLabel("Z Rotation Maximum")
-        self.zrot_min = QtWidgets.QLineEdit()
-        self.zrot_min.setMinimumWidth(100)
-        self.zrot_max = QtWidgets.QLineEdit()
-        self.zrot_max.setMinimumWidth(100)
+        self._set_zrot_spinbox()
         layout.addWidget(self.z_min_lbl, 5, 0)
         layout.addWidget(self.zrot_min, 6, 0)
         layout.addWidget(self.z_max_lbl, 5, 1)
         layout.addWidget(self.zrot_max, 6, 1)
         return layout
 
- def _set_zrot_spinbox(self):
+    def _set_zrot_spinbox(self):
         self.zrot_min = QtWidgets.QSpinBox()
         self.zrot_min.setMinimum(0)
         self.zrot_min.setMaximum(360)
@@ -303,13 +378,201 @@ class ScatterUI(QtWidgets.QDialog):
                                                   "Scatter Percentage")
         self.obj_embed_offset_lbl = QtWidgets.QLabel("Scatter Object Embed "
                                                      "Position Offset")
+        self.output_mode_lbl = QtWidgets.QLabel("Scatter Output")
         self._set_selected_vert_percentage_spinbox()
         self._create_y_position_offset_spinbox()
+        self._create_output_mode_combobox()
         layout.addWidget(self.selected_vert_lbl, 14, 0)
         layout.addWidget(self.obj_embed_offset_lbl, 14, 1)
+        layout.addWidget(self.output_mode_lbl, 14, 2)
         layout.addWidget(self.selected_vert_perc, 15, 0)
         layout.addWidget(self.obj_embed_offset, 15, 1)
+        layout.addWidget(self.output_mode, 15, 2)
         return layout
+    def _create_sampling_ui(self):
+        layout = QtWidgets.QGridLayout()
+        self.sample_mode_lbl = QtWidgets.QLabel("Scatter Sampling")
+        self.surface_sample_count_lbl = QtWidgets.QLabel("Surface Sample "
+                                                         "Count")
+        self.min_spacing_lbl = QtWidgets.QLabel("Minimum Spacing Radius")
+        self.seed_lbl = QtWidgets.QLabel("Random Seed")
+        self._create_sample_mode_widgets()
+        self._create_min_spacing_widgets()
+        self._create_seed_spinbox()
+        layout.addWidget(self.sample_mode_lbl, 0, 0)
+        layout.addWidget(self.surface_sample_count_lbl, 0, 1)
+        layout.addWidget(self.min_spacing_lbl, 0, 2)
+        layout.addWidget(self.seed_lbl, 0, 3)
+        layout.addWidget(self.sample_mode, 1, 0)
+        layout.addWidget(self.surface_sample_count, 1, 1)
+        layout.addWidget(self.min_spacing, 1, 2)
+        layout.addWidget(self.seed, 1, 3)
+        layout.addWidget(self.spacing_from_scale, 2, 2, 1, 2)
+        return layout
+    def _create_variant_weights_ui(self):
+        layout = QtWidgets.QGridLayout()
+        self.variant_weights_lbl = QtWidgets.QLabel("Scatter Object Variant "
+                                                    "Weights")
+        self.variant_weights = QtWidgets.QLineEdit()
+        self.variant_weights.setPlaceholderText("1, 1, 1")
+        layout.addWidget(self.variant_weights_lbl, 0, 0)
+        layout.addWidget(self.variant_weights, 1, 0)
+        return layout
+    def _create_overlap_ui(self):
+        layout = QtWidgets.QGridLayout()
+        self.overlap_mode_lbl = QtWidgets.QLabel("Overlap Rejection")
+        self.overlap_min_scale_lbl = QtWidgets.QLabel("Overlap Relax "
+                                                      "Minimum Scale")
+        self._create_overlap_widgets()
+        layout.addWidget(self.overlap_mode_lbl, 0, 0)
+        layout.addWidget(self.overlap_min_scale_lbl, 0, 1)
+        layout.addWidget(self.overlap_mode, 1, 0)
+        layout.addWidget(self.overlap_min_scale, 1, 1)
+        return layout
+    def _create_overlap_widgets(self):
+        self.overlap_mode = QtWidgets.QComboBox()
+        self.overlap_mode.addItems(["none", "sphere", "box"])
+        self.overlap_mode.setMinimumWidth(100)
+        self.overlap_min_scale = QtWidgets.QDoubleSpinBox()
+        self.overlap_min_scale.setRange(0.05, 1.0)
+        self.overlap_min_scale.setValue(1.0)
+        self.overlap_min_scale.setMinimumWidth(100)
+        self.overlap_min_scale.setSingleStep(.05)
+    def _create_density_mask_ui(self):
+        layout = QtWidgets.QGridLayout()
+        self.density_mask_lbl = QtWidgets.QLabel("Density Masks")
+        self.density_mask_lbl.setStyleSheet("font: bold")
+        layout.addWidget(self.density_mask_lbl, 0, 0)
+        self.slope_mask = QtWidgets.QCheckBox("Slope Angle")
+        self.height_mask = QtWidgets.QCheckBox("Height")
+        self.noise_mask = QtWidgets.QCheckBox("Noise Size / Threshold")
+        self.mask_falloff_lbl = QtWidgets.QLabel("Mask Falloff")
+        self._create_mask_range_spinboxes()
+        layout.addWidget(self.slope_mask, 1, 0)
+        layout.addWidget(self.slope_min, 1, 1)
+        layout.addWidget(self.slope_max, 1, 2)
+        layout.addWidget(self.height_mask, 2, 0)
+        layout.addWidget(self.height_min, 2, 1)
+        layout.addWidget(self.height_max, 2, 2)
+        layout.addWidget(self.noise_mask, 3, 0)
+        layout.addWidget(self.noise_size, 3, 1)
+        layout.addWidget(self.noise_threshold, 3, 2)
+        layout.addWidget(self.mask_falloff_lbl, 1, 3)
+        layout.addWidget(self.mask_falloff, 2, 3)
+        self.density_map_lbl = QtWidgets.QLabel("Density Map")
+        self._create_density_map_widgets()
+        layout.addWidget(self.density_map_lbl, 4, 0)
+        layout.addWidget(self.density_map, 5, 0)
+        layout.addWidget(self.density_map_path, 5, 1, 1, 2)
+        layout.addWidget(self.density_map_channel, 5, 3)
+        return layout
+    def _create_camera_ui(self):
+        layout = QtWidgets.QGridLayout()
+        self.camera_lbl = QtWidgets.QLabel("Camera Culling")
+        self.camera_lbl.setStyleSheet("font: bold")
+        layout.addWidget(self.camera_lbl, 0, 0)
+        self.camera = QtWidgets.QLineEdit()
+        self.camera.setPlaceholderText("No camera, scatter everywhere")
+        self.camera_pb = QtWidgets.QPushButton("Select Camera")
+        self.camera_padding_lbl = QtWidgets.QLabel("Frame Padding")
+        self.camera_frames = QtWidgets.QCheckBox("Frame Range")
+        self.camera_falloff_lbl = QtWidgets.QLabel("Falloff Near / Far / "
+                                                   "Far Density")
+        self._create_camera_spinboxes()
+        layout.addWidget(self.camera, 1, 0, 1, 2)
+        layout.addWidget(self.camera_pb, 1, 2)
+        layout.addWidget(self.camera_padding_lbl, 0, 3)
+        layout.addWidget(self.camera_padding, 1, 3)
+        layout.addWidget(self.camera_frames, 2, 0)
+        layout.addWidget(self.camera_start, 2, 1)
+        layout.addWidget(self.camera_end, 2, 2)
+        layout.addWidget(self.camera_falloff_lbl, 3, 0)
+        layout.addWidget(self.camera_near, 3, 1)
+        layout.addWidget(self.camera_far, 3, 2)
+        layout.addWidget(self.camera_far_density, 3, 3)
+        return layout
+    def _create_camera_spinboxes(self):
+        self.camera_padding = QtWidgets.QDoubleSpinBox()
+        self.camera_padding.setRange(0, 10)
+        self.camera_padding.setValue(0)
+        self.camera_padding.setSingleStep(.05)
+        self.camera_start = QtWidgets.QDoubleSpinBox()
+        self.camera_start.setRange(-100000, 100000)
+        self.camera_start.setValue(1)
+        self.camera_end = QtWidgets.QDoubleSpinBox()
+        self.camera_end.setRange(-100000, 100000)
+        self.camera_end.setValue(120)
+        self.camera_near = QtWidgets.QDoubleSpinBox()
+        self.camera_near.setRange(0, 1000000)
+        self.camera_near.setValue(0)
+        self.camera_far = QtWidgets.QDoubleSpinBox()
+        self.camera_far.setRange(0, 1000000)
+        self.camera_far.setValue(0)
+        self.camera_far_density = QtWidgets.QDoubleSpinBox()
+        self.camera_far_density.setRange(0, 1)
+        self.camera_far_density.setValue(1)
+        self.camera_far_density.setSingleStep(.05)
+    def _create_mask_range_spinboxes(self):
+        self.slope_min = QtWidgets.QDoubleSpinBox()
+        self.slope_min.setMaximum(180)
+        self.slope_min.setValue(0)
+        self.slope_max = QtWidgets.QDoubleSpinBox()
+        self.slope_max.setMaximum(180)
+        self.slope_max.setValue(30)
+        self.height_min = QtWidgets.QDoubleSpinBox()
+        self.height_min.setRange(-100000, 100000)
+        self.height_min.setValue(0)
+        self.height_max = QtWidgets.QDoubleSpinBox()
+        self.height_max.setRange(-100000, 100000)
+        self.height_max.setValue(10)
+        self.noise_size = QtWidgets.QDoubleSpinBox()
+        self.noise_size.setRange(0.01, 100000)
+        self.noise_size.setValue(10)
+        self.noise_threshold = QtWidgets.QDoubleSpinBox()
+        self.noise_threshold.setRange(0, 1)
+        self.noise_threshold.setValue(0.5)
+        self.noise_threshold.setSingleStep(.05)
+        self.mask_falloff = QtWidgets.QDoubleSpinBox()
+        self.mask_falloff.setRange(0, 100000)
+        self.mask_falloff.setValue(0)
+        self.mask_falloff.setSingleStep(.1)
+    def _create_density_map_widgets(self):
+        self.density_map = QtWidgets.QComboBox()
+        self.density_map.addItems(["none", "vertex color", "texture"])
+        self.density_map.setMinimumWidth(100)
+        self.density_map_path = QtWidgets.QLineEdit()
+        self.density_map_path.setPlaceholderText("Texture path")
+        self.density_map_channel = QtWidgets.QComboBox()
+        self.density_map_channel.addItems(["r", "g", "b", "a"])
+    def _create_seed_spinbox(self):
+        self.seed = QtWidgets.QSpinBox()
+        self.seed.setMinimum(0)
+        self.seed.setMaximum(2147483647)
+        self.seed.setValue(0)
+        self.seed.setMinimumWidth(100)
+    def _create_min_spacing_widgets(self):
+        self.min_spacing = QtWidgets.QDoubleSpinBox()
+        self.min_spacing.setMinimum(0)
+        self.min_spacing.setValue(0)
+        self.min_spacing.setMaximum(1000)
+        self.min_spacing.setMinimumWidth(100)
+        self.min_spacing.setSingleStep(.1)
+        self.spacing_from_scale = QtWidgets.QCheckBox(
+            "Scale Spacing by Instance Scale")
+    def _create_sample_mode_widgets(self):
+        self.sample_mode = QtWidgets.QComboBox()
+        self.sample_mode.addItems(["vertices", "surface"])
+        self.sample_mode.setMinimumWidth(100)
+        self.surface_sample_count = QtWidgets.QSpinBox()
+        self.surface_sample_count.setMinimum(0)
+        self.surface_sample_count.setMaximum(10000000)
+        self.surface_sample_count.setValue(1000)
+        self.surface_sample_count.setMinimumWidth(100)
+        self.surface_sample_count.setSingleStep(100)
+    def _create_output_mode_combobox(self):
+        self.output_mode = QtWidgets.QComboBox()
+        self.output_mode.addItems(["transforms", "instancer"])
+        self.output_mode.setMinimumWidth(100)
     def _create_y_position_offset_spinbox(self):
         self.obj_embed_offset = QtWidgets.QDoubleSpinBox()
         self.obj_embed_offset.setMinimum(-10)
@@ -330,6 +593,14 @@ class ScatterUI(QtWidgets.QDialog):
         self.reset_btn = QtWidgets.QPushButton("Reset")
         layout.addWidget(self.scatter_btn, 16, 0)
         layout.addWidget(self.reset_btn, 16, 1)
+        self.export_btn = QtWidgets.QPushButton("Export Layout")
+        self.import_btn = QtWidgets.QPushButton("Import Layout")
+        layout.addWidget(self.export_btn, 16, 2)
+        layout.addWidget(self.import_btn, 16, 3)
+        self.follow_target = QtWidgets.QCheckBox("Follow Deforming Target")
+        self.update_attached_btn = QtWidgets.QPushButton("Update Attached")
+        layout.addWidget(self.follow_target, 17, 0, 1, 2)
+        layout.addWidget(self.update_attached_btn, 17, 2)
         return layout
         
     def _create_scatter_field_headers(self):
@@ -355,10 +626,75 @@ class ScatterUI(QtWidgets.QDialog):
         self.scatterobject.scatter_scale_ymax = self.scale_ymax.value()
         self.scatterobject.scatter_scale_zmin = self.scale_zmin.value()
         self.scatterobject.scatter_scale_zmax = self.scale_zmax.value()
+        self.scatterobject.scatter_percentage = self.selected_vert_perc.value()
+        self.scatterobject.obj_pos_offset = self.obj_embed_offset.value()
+        self.scatterobject.output_mode = self.output_mode.currentText()
+        self.scatterobject.sample_mode = self.sample_mode.currentText()
+        self.scatterobject.min_spacing = self.min_spacing.value()
+        self.scatterobject.seed = self.seed.value()
+        self.scatterobject.spacing_from_scale = \
+            self.spacing_from_scale.isChecked()
+        self.scatterobject.surface_sample_count = \
+            self.surface_sample_count.value()
+        self._set_variant_weights_from_ui()
+        self.scatterobject.overlap_mode = self.overlap_mode.currentText()
+        self.scatterobject.overlap_min_scale = self.overlap_min_scale.value()
+        self.scatterobject.density_masks = self._density_masks_from_ui()
+        self._set_camera_from_ui()
+
+    def _set_camera_from_ui(self):
+        self.scatterobject.camera = self.camera.text().strip() or None
+        self.scatterobject.camera_padding = self.camera_padding.value()
+        self.scatterobject.camera_frames = None
+        if self.camera_frames.isChecked():
+            self.scatterobject.camera_frames = [self.camera_start.value(),
+                                                self.camera_end.value()]
+        self.scatterobject.camera_falloff = []
+        if self.camera_far.value() > self.camera_near.value():
+            self.scatterobject.camera_falloff = [
+                [self.camera_near.value(), 1.0],
+                [self.camera_far.value(), self.camera_far_density.value()]]
+
+    def _density_masks_from_ui(self):
+        masks = []
+        falloff = self.mask_falloff.value()
+        if self.slope_mask.isChecked():
+            masks.append({"type": "slope", "min": self.slope_min.value(),
+                          "max": self.slope_max.value(),
+                          "falloff": falloff})
+        if self.height_mask.isChecked():
+            masks.append({"type": "height", "min": self.height_min.value(),
+                          "max": self.height_max.value(),
+                          "falloff": falloff})
+        if self.noise_mask.isChecked():
+            masks.append({"type": "noise", "size": self.noise_size.value(),
+                          "min": self.noise_threshold.value(), "max": 1.0,
+                          "falloff": falloff, "seed": self.seed.value()})
+        channel = self.density_map_channel.currentText()
+        if self.density_map.currentText() == "vertex color":
+            masks.append({"type": "vertex_color", "channel": channel})
+        elif self.density_map.currentText() == "texture":
+            masks.append({"type": "texture", "channel": channel,
+                          "path": self.density_map_path.text()})
+        return masks
+
+    def _set_variant_weights_from_ui(self):
+        text = self.variant_weights.text().strip()
+        if not text:
+            return
+        try:
+            self.scatterobject.variant_weights = [
+                float(weight) for weight in text.split(",")]
+        except ValueError:
+            log.warning("Variant weights must be comma separated numbers, "
+                        "one per scatter object. Resubmit values correctly.")
 
     def _set_selected_scatter_object(self):
         self.scatterobject.select_scatter_object()
         self.scatter_obj.setText(self.scatterobject.current_object_def)
+        self.variant_weights.setText(", ".join(
+            "{:g}".format(weight)
+            for weight in self.scatterobject.variant_weights))
 
     def _set_selected_scatter_target(self):
         self.scatterobject.select_target_object()
@@ -377,131 +713,29 @@ class ScatterUI(QtWidgets.QDialog):
         self.scatterobject.scatter_scale_ymax = self.scale_ymax.setValue(1.0)
         self.scatterobject.scatter_scale_zmin = self.scale_zmin.setValue(1.0)
         self.scatterobject.scatter_scale_zmax = self.scale_zmax.setValue(1.0)
+        self.output_mode.setCurrentIndex(0)
+        self.sample_mode.setCurrentIndex(0)
+        self.min_spacing.setValue(0)
+        self.seed.setValue(0)
+        self.spacing_from_scale.setChecked(False)
+        self.surface_sample_count.setValue(1000)
+        self.variant_weights.setText("")
+        self.overlap_mode.setCurrentIndex(0)
+        self.overlap_min_scale.setValue(1.0)
+        self.slope_mask.setChecked(False)
+        self.height_mask.setChecked(False)
+        self.noise_mask.setChecked(False)
+        self.mask_falloff.setValue(0)
+        self.density_map.setCurrentIndex(0)
+        self.density_map_path.setText("")
+        self.camera.setText("")
+        self.camera_padding.setValue(0)
+        self.camera_frames.setChecked(False)
+        self.camera_start.setValue(1)
+        self.camera_end.setValue(120)
+        self.camera_near.setValue(0)
+        self.camera_far.setValue(0)
+        self.camera_far_density.setValue(1)
+        self.follow_target.setChecked(False)
         self.scatterobject.scatter_obj_def = self.scatter_obj.setText("")
         self.scatterobject.scatter_target_def = self.scatter_targ.setText("")
-
-
-class ScatterObject(object):
-    """Functionality to scatter UI and random rotation/scale"""
-
-    def __init__(self):
-        self.scatter_x_min = 0
-        self.scatter_x_max = 0
-        self.scatter_y_min = 0
-        self.scatter_y_max = 0
-        self.scatter_z_min = 0
-        self.scatter_z_max = 0
-        self.scatter_scale_xmin = 0
-        self.scatter_scale_xmax = 0
-        self.scatter_scale_ymin = 0
-        self.scatter_scale_ymax = 0
-        self.scatter_scale_zmin = 0
-        self.scatter_scale_zmax = 0
-        self.scatter_obj_def = None
-        self.current_object_def = None
-        self.scatter_target_def = None
-        self.current_target_def = None
-
-    def scatter_check(self):
-        if self.scatter_x_min > self.scatter_x_max or \
-                self.scatter_y_min > self.scatter_y_max or \
-                self.scatter_z_min > self.scatter_z_max or \
-                self.scatter_scale_xmin > self.scatter_scale_xmax or \
-                self.scatter_scale_ymin > self.scatter_scale_ymax or \
-                self.scatter_scale_zmin > self.scatter_scale_zmax:
-            log.warning("Minimum value(s) greater than maximum value(s). "
-                        "This is not valid. Resubmit values correctly.")
-        else:
-if self.scatter_percentage == 0:
-                log.warning("Percentage set to 0, no vertices randomly "
-                            "selected. Specify a higher percentage.")
-            else:
-                self.scatter_check_internal_align_check()
-    def scatter_check_internal_align_check(self):
-        if self.form_of_scatter == 0:
-            self.random_scatter_vertices()
-            self.scatter_object()
-        elif self.form_of_scatter == 1:
-            self.random_scatter_vertices()
-            self.scatter_object_align_normals()
-        elif self.form_of_scatter == 2:
-            self.random_scatter_vertices()
-            self.scatter_object_align_normals_and_rand_rotation()
-
-
-def scatter_object(self):
-        object_grouping = cmds.group(empty=True, name="instance_group#")
-        for target in self.percentage_selection:
-            self.scatterObject = cmds.instance(self.current_object_def,
-                                               name=self.current_object_def
-                                               + "_instance#")
-            cmds.parent(self.scatterObject, object_grouping)
-            x_point, y_point, z_point = cmds.pointPosition(target)
-            cmds.move(x_point, y_point, z_point, self.scatterObject)
-            self.create_scale_scatter_randomization()
-            self.offset_scatter_object_embed_pos_without_constraint()
-            self.create_rotation_scatter_randomization()
-    def scatter_object_align_normals(self):
-        object_grouping = cmds.group(empty=True, name="instance_group#")
-        for target in self.percentage_selection:
-            self.scatterObject = cmds.instance(self.current_object_def,
-                                               name=self.current_object_def
-                                               + "_instance#")
-            cmds.parent(self.scatterObject, object_grouping)
-            x_point, y_point, z_point = cmds.pointPosition(target)
-            cmds.move(x_point, y_point, z_point, self.scatterObject)
-            self.create_scale_scatter_randomization()
-            constraint = cmds.normalConstraint(self.scatter_target_def,
-                                               self.scatterObject)
-            cmds.delete(constraint)
-            self.offset_scatter_object_embed_pos()
-            self.create_rotation_scatter_randomization()
-    def offset_scatter_object_embed_pos(self):
-        cmds.move(self.obj_pos_offset, 0, 0, self.scatterObject,
-                  objectSpace=True, relative=True)
-    def offset_scatter_object_embed_pos_without_constraint(self):
-        cmds.move(0, self.obj_pos_offset, 0, self.scatterObject,
-                  objectSpace=True, relative=True)
-    def select_target_object(self):
-        selection = cmds.ls(os=True, fl=True)
-        self.scatter_target_def = cmds.polyListComponentConversion(
-            selection, toVertex=True)
-        self.scatter_target_def = cmds.filterExpand(self.scatter_target_def,
-                                                    selectionMask=31)
-        if self.scatter_target_def is None:
-            self.current_target_def = ''
-            log.warning("No object or vertices are currently selected for "
-                        "scatter destination. Select one or more vertices, or "
-                        "an object and then try again.")
-        else:
-            self.current_target_def = self.scatter_target_def
-    def random_scatter_vertices(self):
-        random_amount = int(round(len(self.scatter_target_def)
-                                  * (self.scatter_percentage * 0.01)))
-        self.percentage_selection = random.sample(self.scatter_target_def,
-                                                  k=random_amount)
-        cmds.select(self.percentage_selection)
-
-def create_rotation_scatter_randomization(self):
-        x_rot = random.uniform(self.scatter_x_min, self.scatter_x_max)
-        y_rot = random.uniform(self.scatter_y_min, self.scatter_y_max)
-        z_rot = random.uniform(self.scatter_z_min, self.scatter_z_max)
-        cmds.rotate(x_rot, y_rot, z_rot, self.scatterObject)
-    def create_scale_scatter_randomization(self):
-        scale_factor_x = random.uniform(self.scatter_scale_xmin,
-                                        self.scatter_scale_xmax)
-        scale_factor_y = random.uniform(self.scatter_scale_ymin,
-                                        self.scatter_scale_ymax)
-        scale_factor_z = random.uniform(self.scatter_scale_zmin,
-                                        self.scatter_scale_zmax)
-        cmds.scale(scale_factor_x, scale_factor_y, scale_factor_z,
-                   self.scatterObject)
-    def select_scatter_object(self):
-        self.scatter_obj_def = cmds.ls(os=True, o=True)
-        if len(self.scatter_obj_def) > 0:
-            self.current_object_def = self.scatter_obj_def[-1]
-        else:
-            self.current_object_def = None
-            log.warning("No objects are currently selected for object being"
-                        " scattered. Select one or more objects and then "
-                        "try again.")
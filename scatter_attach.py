@@ -0,0 +1,69 @@
+"""Surface attachments that keep scatter instances on a deforming target
+
+An attachment records where every instance of a plan sits on its target:
+its vertex, or its triangle and barycentric weights, along with how the
+instance is oriented relative to the surface there. Given the target's
+current points and normals it recomputes every instance transform in
+one vectorized pass, so instances follow the target as it deforms.
+"""
+import numpy as np
+
+from scatter_plan import (euler_xyz_to_matrix, matrix_to_euler_xyz,
+                          normal_frames)
+
+
+class SurfaceAttachment(object):
+    """Attaches the instances of a plan to the target mesh it was planned on
+
+    triangles is the target's (T, 3) triangulation the plan's face ids
+    index and vertex_count its number of vertices. form_of_scatter and
+    offset are the planner's, so an undeformed target gives back the
+    planned transforms.
+    """
+
+    def __init__(self, plan, triangles, vertex_count, form_of_scatter=0,
+                 offset=0.0):
+        self.vertex_count = vertex_count
+        self.aligned = form_of_scatter in (1, 2)
+        self.offset = float(offset)
+        if len(plan) and plan["face"][0] >= 0:
+            self.corners = np.ascontiguousarray(
+                triangles.take(plan["face"], axis=0).T)
+            self.weights = np.ascontiguousarray(plan["barycentric"].T)
+        else:
+            self.corners = plan["vertex"][np.newaxis].copy()
+            self.weights = np.ones((1, len(plan)))
+        self.scales = plan["scale"].copy()
+        self.rotates = plan["rotate"].copy()
+        self.spins = None
+        if self.aligned:
+            self.spins = np.matmul(
+                euler_xyz_to_matrix(self.rotates),
+                normal_frames(plan["normal"]).transpose(0, 2, 1))
+
+    def __len__(self):
+        return len(self.scales)
+
+    def surface(self, points, normals):
+        """Returns the attached positions and normals on points, normals"""
+        positions = np.zeros((len(self), 3))
+        blended = np.zeros((len(self), 3))
+        for corner, weight in zip(self.corners, self.weights):
+            positions += points.take(corner, axis=0) * weight[:, np.newaxis]
+            blended += normals.take(corner, axis=0) * weight[:, np.newaxis]
+        if len(self.corners) > 1:
+            blended /= np.maximum(np.linalg.norm(blended, axis=1),
+                                  1e-12)[:, np.newaxis]
+        return positions, blended
+
+    def transforms(self, points, normals):
+        """Returns instance translates, rotates and scales on a target
+        whose vertices are now at points with normals"""
+        positions, blended = self.surface(points, normals)
+        if not self.aligned:
+            positions[:, 1] += self.offset
+            return positions, self.rotates, self.scales
+        positions += blended * self.offset
+        rotates = matrix_to_euler_xyz(
+            np.matmul(self.spins, normal_frames(blended)))
+        return positions, rotates, self.scales
@@ -0,0 +1,589 @@
+import collections
+import ctypes
+import logging
+import time
+
+import numpy as np
+
+from scatter_undo import run_undoable
+
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+except ImportError:
+    cmds = None
+    om = None
+
+log = logging.getLogger(__name__)
+
+
+class _InstanceCreation(object):
+    """Creates a modifier's transforms and instances children under each"""
+
+    def __init__(self, modifier, transforms, children):
+        self.modifier = modifier
+        self.transforms = transforms
+        self.children = children
+
+    def doIt(self):
+        self.modifier.doIt()
+        for transform in self.transforms:
+            dag_fn = om.MFnDagNode(transform)
+            for child in self.children:
+                dag_fn.addChild(child, om.MFnDagNode.kNextPos, True)
+
+    def undoIt(self):
+        for transform in self.transforms:
+            dag_fn = om.MFnDagNode(transform)
+            for child in self.children:
+                dag_fn.removeChild(child)
+        self.modifier.undoIt()
+
+
+class _TransformWrite(object):
+    """Writes transforms, rotates in radians, onto dag paths and back"""
+
+    def __init__(self, paths, translates, rotates, scales):
+        self.paths = paths
+        self.values = (translates, rotates, scales)
+        self.previous = None
+
+    def doIt(self):
+        if self.previous is None:
+            self.previous = _read_transforms(self.paths)
+        _write_transforms(self.paths, *self.values)
+
+    def undoIt(self):
+        _write_transforms(self.paths, *self.previous)
+
+
+def _read_transforms(paths):
+    """Returns the translates, rotates (radians) and scales of paths"""
+    translates = np.empty((len(paths), 3))
+    rotates = np.empty((len(paths), 3))
+    scales = np.empty((len(paths), 3))
+    transform_fn = om.MFnTransform()
+    for index, path in enumerate(paths):
+        transform_fn.setObject(path)
+        translates[index] = tuple(
+            transform_fn.translation(om.MSpace.kTransform))
+        rotation = transform_fn.rotation(om.MSpace.kTransform)
+        rotates[index] = rotation.x, rotation.y, rotation.z
+        scales[index] = transform_fn.scale()
+    return translates, rotates, scales
+
+
+def _write_transforms(paths, translates, rotates, scales):
+    """Sets translates, rotates (radians) and scales on paths"""
+    transform_fn = om.MFnTransform()
+    for index, path in enumerate(paths):
+        transform_fn.setObject(path)
+        transform_fn.setTranslation(om.MVector(*translates[index]),
+                                    om.MSpace.kTransform)
+        transform_fn.setRotation(om.MEulerRotation(*rotates[index]),
+                                 om.MSpace.kTransform)
+        transform_fn.setScale(scales[index])
+
+
+class MayaBackend(object):
+    """Writes scatter instances into the Maya scene in bulk"""
+
+    def create_group(self, name):
+        return cmds.group(empty=True, name=name)
+
+    def mesh_arrays(self, mesh):
+        """Returns world space points and vertex normals of mesh
+
+        Both are (V, 3) float64 arrays indexed by vertex id, read with a
+        single MFnMesh call each.
+        """
+        mesh_fn = om.MFnMesh(self._dag_path(mesh))
+        points = np.array(mesh_fn.getPoints(om.MSpace.kWorld),
+                          dtype=np.float64)[:, :3]
+        normals = np.array(mesh_fn.getVertexNormals(False, om.MSpace.kWorld),
+                           dtype=np.float64)
+        return points, normals
+
+    def vertex_count(self, mesh):
+        return om.MFnMesh(self._dag_path(mesh)).numVertices
+
+    def mesh_triangles(self, mesh):
+        """Returns the triangulated faces of mesh as (T, 3) vertex ids"""
+        mesh_fn = om.MFnMesh(self._dag_path(mesh))
+        vertex_ids = mesh_fn.getTriangles()[1]
+        return np.array(vertex_ids, dtype=np.int64).reshape(-1, 3)
+
+    def mesh_vertex_colors(self, mesh):
+        """Returns the RGBA vertex colors of mesh as a (V, 4) array
+
+        Vertices without a color read as white.
+        """
+        mesh_fn = om.MFnMesh(self._dag_path(mesh))
+        colors = np.array([tuple(color) for color in
+                           mesh_fn.getVertexColors()], dtype=np.float64)
+        return np.where(colors < 0, 1.0, colors).reshape(-1, 4)
+
+    def mesh_vertex_uvs(self, mesh):
+        """Returns a UV per vertex of mesh as a (V, 2) array
+
+        Vertices on a UV seam take the UV of their last face. Vertices of
+        faces without UVs are left at 0, 0.
+        """
+        mesh_fn = om.MFnMesh(self._dag_path(mesh))
+        us, vs = mesh_fn.getUVs()
+        vertex_counts, vertex_list = mesh_fn.getVertices()
+        uv_counts, uv_ids = mesh_fn.getAssignedUVs()
+        vertex_counts = np.array(vertex_counts, dtype=np.int64)
+        mapped = np.repeat(np.array(uv_counts) == vertex_counts,
+                           vertex_counts)
+        uvs = np.zeros((mesh_fn.numVertices, 2))
+        uv_ids = np.array(uv_ids, dtype=np.int64)
+        uvs[np.array(vertex_list, dtype=np.int64)[mapped]] = np.stack(
+            (np.array(us)[uv_ids], np.array(vs)[uv_ids]), axis=1)
+        return uvs
+
+    def read_image(self, path):
+        """Returns the RGBA pixels of an image file as a (H, W, 4) uint8
+        array, bottom row first"""
+        image = om.MImage()
+        image.readFromFile(path)
+        width, height = image.getSize()
+        buffer = (ctypes.c_ubyte * (width * height * 4)).from_address(
+            image.pixels())
+        return np.frombuffer(buffer, dtype=np.uint8).reshape(
+            height, width, 4).copy()
+
+    def object_bounds(self, node):
+        """Returns the object space (min, max) bounds of node as a (2, 3)
+        array"""
+        bounds = cmds.xform(node, query=True, boundingBox=True,
+                            objectSpace=True)
+        return np.array(bounds, dtype=np.float64).reshape(2, 3)
+
+    def camera_views(self, camera, frames):
+        """Returns a scatter_camera view of camera on each of frames
+
+        A frame of None reads the current frame. The field of view comes
+        from the film aperture and focal length, ignoring film fit and
+        offsets.
+        """
+        shape = camera
+        if cmds.nodeType(camera) != "camera":
+            shape = cmds.listRelatives(camera, shapes=True, fullPath=True,
+                                       type="camera")[0]
+        views = []
+        for frame in frames:
+            at_time = {} if frame is None else {"time": frame}
+            matrix = cmds.getAttr(shape + ".worldInverseMatrix[0]",
+                                  **at_time)
+            focal = cmds.getAttr(shape + ".focalLength", **at_time)
+            apertures = [cmds.getAttr(shape + "." + attr, **at_time)
+                         for attr in ("horizontalFilmAperture",
+                                      "verticalFilmAperture")]
+            views.append({
+                "matrix": np.array(matrix, dtype=np.float64).reshape(4, 4),
+                "tan_fov": tuple(aperture * 25.4 * 0.5 / focal
+                                 for aperture in apertures),
+                "near": cmds.getAttr(shape + ".nearClipPlane", **at_time),
+                "far": cmds.getAttr(shape + ".farClipPlane", **at_time)})
+        return views
+
+    def selected_objects(self):
+        return cmds.ls(orderedSelection=True, objectsOnly=True)
+
+    def selected_vertices(self):
+        """Returns the selected mesh and its selected vertex ids
+
+        Components are converted to vertices as compact ranges and read
+        back as an integer array, without flattening them into one
+        string per vertex. Returns (None, empty) when nothing usable is
+        selected.
+        """
+        components = cmds.polyListComponentConversion(
+            cmds.ls(selection=True), toVertex=True)
+        if not components:
+            return None, np.zeros(0, dtype=np.int64)
+        selection = om.MSelectionList()
+        for component in components:
+            selection.add(component)
+        mesh = None
+        vertex_ids = []
+        for index in range(selection.length()):
+            dag_path, component = selection.getComponent(index)
+            if dag_path.apiType() == om.MFn.kMesh:
+                dag_path.pop()
+            if mesh is None:
+                mesh = dag_path.fullPathName()
+            elif dag_path.fullPathName() != mesh:
+                log.warning("Only one scatter target mesh is supported, "
+                            "ignoring {}".format(dag_path.fullPathName()))
+                continue
+            elements = om.MFnSingleIndexedComponent(component).getElements()
+            vertex_ids.append(np.array(elements, dtype=np.int64))
+        return mesh, np.unique(np.concatenate(vertex_ids))
+
+    def open_undo_chunk(self, name):
+        cmds.undoInfo(openChunk=True, chunkName=name)
+
+    def close_undo_chunk(self):
+        cmds.undoInfo(closeChunk=True)
+
+    def suspend_refresh(self, suspend):
+        cmds.refresh(suspend=suspend)
+
+    def delete_nodes(self, nodes):
+        cmds.delete(nodes)
+
+    def node_exists(self, node):
+        return node is not None and cmds.objExists(node)
+
+    def set_scatter_settings(self, node, settings):
+        """Stores a JSON settings string on node"""
+        if not cmds.attributeQuery("scatterSettings", node=node,
+                                   exists=True):
+            cmds.addAttr(node, longName="scatterSettings",
+                         dataType="string")
+        cmds.setAttr(node + ".scatterSettings", settings, type="string")
+
+    def scatter_settings(self, node):
+        if not cmds.attributeQuery("scatterSettings", node=node,
+                                   exists=True):
+            return None
+        return cmds.getAttr(node + ".scatterSettings")
+
+    def select_vertices(self, mesh, vertex_ids):
+        """Selects the vertex ids of mesh in one selection list update"""
+        component_fn = om.MFnSingleIndexedComponent()
+        component = component_fn.create(om.MFn.kMeshVertComponent)
+        component_fn.addElements(vertex_ids.tolist())
+        selection = om.MSelectionList()
+        selection.add((self._dag_path(mesh), component))
+        om.MGlobal.setActiveSelectionList(selection)
+
+    def create_instances(self, source, count, parent, first_index=1):
+        """Creates count instances of source under parent in one modifier
+
+        Instances are numbered from first_index. The modifier runs
+        through one scatterApply command, so the creation is undone as a
+        single step.
+        """
+        source_path = self._dag_path(source)
+        children = [source_path.child(i)
+                    for i in range(source_path.childCount())]
+        parent_obj = self._dag_path(parent).node()
+        base_name = source.split("|")[-1] + "_instance"
+        modifier = om.MDagModifier()
+        transforms = []
+        for index in range(count):
+            transform = modifier.createNode("transform", parent_obj)
+            modifier.renameNode(transform,
+                                base_name + str(first_index + index))
+            transforms.append(transform)
+        run_undoable(_InstanceCreation(modifier, transforms, children))
+        return [om.MFnDagNode(transform).fullPathName()
+                for transform in transforms]
+
+    def set_transforms(self, nodes, translates, rotates, scales,
+                       undoable=False):
+        """Writes translate, rotate (degrees) and scale for every node
+
+        API writes are not recorded on the undo queue. With undoable the
+        same bulk write runs through one scatterApply command, which
+        reads the previous transforms first so undo can put them back.
+        """
+        selection = om.MSelectionList()
+        for node in nodes:
+            selection.add(node)
+        paths = [selection.getDagPath(index) for index in range(len(nodes))]
+        write = _TransformWrite(paths, translates, np.radians(rotates),
+                                scales)
+        if undoable:
+            run_undoable(write)
+        else:
+            _write_transforms(paths, *write.values)
+
+    def create_instancer(self, sources, translates, rotates, scales, parent,
+                         variants=None):
+        """Scatters sources through one particle instancer under parent
+
+        Positions, rotations (degrees), scales and the index into sources
+        of every point are stored as per-point array attributes, so the
+        node count does not grow with the number of points or variants.
+        The current and initial state arrays are both set, so the
+        instances show right away rather than at the start frame.
+        """
+        if variants is None:
+            variants = np.zeros(len(translates))
+        particle, particle_shape = cmds.particle(
+            position=[tuple(point) for point in translates],
+            name=sources[0].split("|")[-1] + "_scatter_points#")
+        for attr, values in (("rotationPP", rotates), ("scalePP", scales)):
+            vectors = [tuple(value) for value in values]
+            for name in (attr, attr + "0"):
+                cmds.addAttr(particle_shape, longName=name,
+                             dataType="vectorArray")
+                cmds.setAttr(particle_shape + "." + name, vectors,
+                             type="vectorArray")
+        variant_values = np.asarray(variants, dtype=np.float64).tolist()
+        for name in ("variantPP", "variantPP0"):
+            cmds.addAttr(particle_shape, longName=name,
+                         dataType="doubleArray")
+            cmds.setAttr(particle_shape + "." + name, variant_values,
+                         type="doubleArray")
+        instancer = cmds.particleInstancer(particle_shape, addObject=True,
+                                           object=list(sources),
+                                           objectIndex="variantPP",
+                                           rotation="rotationPP",
+                                           scale="scalePP")
+        cmds.parent(particle, parent)
+        return instancer
+
+    def set_instancer_transforms(self, instancer, translates, rotates,
+                                 scales):
+        """Rewrites the per-point positions, rotations (degrees) and scales
+        of an instancer's particles, current and initial state alike
+
+        Each array is built from its NumPy buffer in one call and set as
+        vector array data straight on the particle shape's plugs.
+        """
+        instancer_fn = om.MFnDependencyNode(self._dag_path(instancer).node())
+        particle_fn = om.MFnDependencyNode(
+            instancer_fn.findPlug("inputPoints", False).source().node())
+        for attr, values in (("position", translates),
+                             ("rotationPP", rotates), ("scalePP", scales)):
+            data = om.MFnVectorArrayData().create(om.MVectorArray(
+                np.asarray(values, dtype=np.float64).tolist()))
+            for name in (attr, attr + "0"):
+                particle_fn.findPlug(name, False).setMObject(data)
+
+    def add_time_callback(self, callback):
+        """Calls callback without arguments whenever the current time
+        changes and returns the callback id"""
+        return om.MDGMessage.addTimeChangeCallback(
+            lambda *args: callback())
+
+    def remove_callback(self, callback_id):
+        om.MMessage.removeCallback(callback_id)
+
+    @staticmethod
+    def _dag_path(name):
+        selection = om.MSelectionList()
+        selection.add(name)
+        return selection.getDagPath(0)
+
+
+class FakeBackend(object):
+    """In-memory stand-in for MayaBackend that counts scene calls
+
+    latency is slept on every call to approximate command dispatch cost
+    when benchmarking. Node and settings edits that Maya can undo are kept
+    on undo_queue, one entry per undo chunk, and reverted by undo.
+    """
+
+    def __init__(self, points=None, normals=None, triangles=None,
+                 latency=0.0, colors=None, uvs=None):
+        self.calls = collections.Counter()
+        self.latency = latency
+        self.points = np.zeros((0, 3)) if points is None else points
+        if normals is None:
+            normals = np.tile((0.0, 1.0, 0.0), (len(self.points), 1))
+        self.normals = normals
+        if triangles is None:
+            triangles = np.zeros((0, 3), dtype=np.int64)
+        self.triangles = triangles
+        if colors is None:
+            colors = np.ones((len(self.points), 4))
+        self.colors = colors
+        self.uvs = np.zeros((0, 2)) if uvs is None else uvs
+        self.objects = ["pRock1"]
+        self.bounds = {}
+        self.cameras = {}
+        self.nodes = collections.OrderedDict()
+        self.transforms = []
+        self.selection = []
+        self.callbacks = collections.OrderedDict()
+        self.undo_queue = []
+        self._undo_chunks = []
+        self._group_count = 0
+        self._callback_count = 0
+
+    def _record(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _undoable(self, inverse):
+        """Records inverse to revert the edit just made on undo"""
+        if self._undo_chunks:
+            self._undo_chunks[-1].append(inverse)
+        else:
+            self.undo_queue.append([inverse])
+
+    def undo(self):
+        """Reverts the last undo chunk, as Maya's undo would"""
+        for inverse in reversed(self.undo_queue.pop()):
+            inverse()
+
+    def create_group(self, name):
+        self._record("group")
+        self._group_count += 1
+        group = name.replace("#", str(self._group_count))
+        self.nodes[group] = {"parent": None, "children": []}
+        self._undoable(lambda: self.nodes.pop(group))
+        return group
+
+    def mesh_arrays(self, mesh):
+        self._record("mesh_arrays")
+        return self.points, self.normals
+
+    def vertex_count(self, mesh):
+        self._record("vertex_count")
+        return len(self.points)
+
+    def mesh_triangles(self, mesh):
+        self._record("mesh_triangles")
+        return self.triangles
+
+    def mesh_vertex_colors(self, mesh):
+        self._record("mesh_vertex_colors")
+        return self.colors
+
+    def mesh_vertex_uvs(self, mesh):
+        self._record("mesh_vertex_uvs")
+        return self.uvs
+
+    def read_image(self, path):
+        self._record("read_image")
+        return np.load(path)
+
+    def object_bounds(self, node):
+        self._record("xform")
+        return np.array(self.bounds.get(node, ((-0.5, -0.5, -0.5),
+                                               (0.5, 0.5, 0.5))),
+                        dtype=np.float64)
+
+    def camera_views(self, camera, frames):
+        self._record("getAttr")
+        views = self.cameras[camera]
+        return [views[0 if frame is None else int(frame) % len(views)]
+                for frame in frames]
+
+    def selected_objects(self):
+        self._record("ls")
+        return list(self.objects)
+
+    def selected_vertices(self):
+        self._record("selected_vertices")
+        return "pMesh1", np.arange(len(self.points), dtype=np.int64)
+
+    def select_vertices(self, mesh, vertex_ids):
+        self._record("select_vertices")
+        self.selection = vertex_ids
+
+    def open_undo_chunk(self, name):
+        self._record("undo_chunk")
+        self._undo_chunks.append([])
+
+    def close_undo_chunk(self):
+        self._record("undo_chunk")
+        chunk = self._undo_chunks.pop()
+        if self._undo_chunks:
+            self._undo_chunks[-1].extend(chunk)
+        elif chunk:
+            self.undo_queue.append(chunk)
+
+    def suspend_refresh(self, suspend):
+        self._record("refresh")
+
+    def delete_nodes(self, nodes):
+        self._record("delete")
+        deleted = collections.OrderedDict(
+            (node, self.nodes.pop(node)) for node in nodes
+            if node in self.nodes)
+        self._undoable(lambda: self.nodes.update(deleted))
+
+    def node_exists(self, node):
+        self._record("objExists")
+        return node in self.nodes
+
+    def set_scatter_settings(self, node, settings):
+        self._record("setAttr")
+        attrs = self.nodes[node]
+        previous = attrs.get("scatterSettings")
+        attrs["scatterSettings"] = settings
+        self._undoable(lambda: attrs.update(scatterSettings=previous))
+
+    def scatter_settings(self, node):
+        self._record("getAttr")
+        return self.nodes[node].get("scatterSettings")
+
+    def create_instances(self, source, count, parent, first_index=1):
+        self._record("create_instances")
+        nodes = ["{}|{}_instance{}".format(parent, source, first_index + index)
+                 for index in range(count)]
+        children = self.nodes[parent]["children"]
+        start = len(children)
+        children.extend(nodes)
+        self._undoable(lambda: children.__delitem__(
+            slice(start, start + count)))
+        return nodes
+
+    def set_transforms(self, nodes, translates, rotates, scales,
+                       undoable=False):
+        """Logs the write, counting the transforms an undoable write reads
+        back to restore on undo"""
+        self._record("scatterApply" if undoable else "set_transforms")
+        if undoable:
+            self.calls["read_transforms"] += len(nodes)
+        self.transforms.append((nodes, np.array(translates),
+                                np.array(rotates), np.array(scales)))
+
+    def create_instancer(self, sources, translates, rotates, scales, parent,
+                         variants=None):
+        self._record("create_instancer")
+        instancer = "{}_instancer{}".format(sources[0], self._group_count)
+        children = self.nodes[parent]["children"]
+        children.append(instancer)
+        self._undoable(lambda: children.remove(instancer))
+        self.transforms.append(([instancer], np.array(translates),
+                                np.array(rotates), np.array(scales)))
+        return instancer
+
+    def set_instancer_transforms(self, instancer, translates, rotates,
+                                 scales):
+        self._record("setAttr")
+        self.transforms.append(([instancer], np.array(translates),
+                                np.array(rotates), np.array(scales)))
+
+    def add_time_callback(self, callback):
+        self._record("add_time_callback")
+        self._callback_count += 1
+        self.callbacks[self._callback_count] = callback
+        return self._callback_count
+
+    def remove_callback(self, callback_id):
+        self._record("remove_callback")
+        self.callbacks.pop(callback_id, None)
+
+    def change_time(self):
+        """Calls the time callbacks as a time change in Maya would"""
+        for callback in list(self.callbacks.values()):
+            callback()
+
+
+class CountingBackend(object):
+    """Wraps a backend and counts calls to each of its methods"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = collections.Counter()
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attr(*args, **kwargs)
+        return counted
@@ -0,0 +1,155 @@
+"""Runs scatter jobs headlessly under mayapy
+
+    mayapy scatter_batch.py jobs.json --processes 4 --report report.json
+
+The job file is JSON, or YAML when PyYAML is installed, holding a list of
+jobs (or a mapping with a "jobs" list). Each job is a mapping of:
+
+    scene           scene file to open
+    target          mesh to scatter onto
+    scatter_object  object to scatter, or a list of variants to scatter
+    variant_weights relative weight of each variant, optional
+    parameters      ScatterPlanner parameters, optional
+    seed            random seed, optional
+    camera          only scatter what this camera sees, optional
+    output_mode     "transforms" or "instancer", optional
+    output_scene    where to save the result, defaults to scene
+    layout          also export the scatter to this layout file, optional
+
+Jobs run one after another in this process, or each in its own mayapy
+process with --processes. A per-job timing summary is logged and
+optionally written as JSON.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+from concurrent import futures
+
+log = logging.getLogger(__name__)
+
+
+def load_jobs(path):
+    """Returns the list of jobs in a JSON or YAML job file"""
+    with open(path) as job_file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            import yaml
+            jobs = yaml.safe_load(job_file)
+        else:
+            jobs = json.load(job_file)
+    if isinstance(jobs, dict):
+        jobs = jobs["jobs"]
+    return jobs
+
+
+def run_job(job, workers=1):
+    """Opens the job's scene, scatters and saves it, returns a summary"""
+    import maya.cmds as cmds
+    from scatter_object import ScatterObject
+
+    summary = {"scene": job["scene"], "target": job["target"],
+               "scatter_object": job["scatter_object"]}
+    start = timeit.default_timer()
+    try:
+        cmds.file(job["scene"], open=True, force=True)
+        scatter = ScatterObject()
+        scatter.planning_workers = workers
+        scatter.set_scatter_parameters(job.get("parameters", {}))
+        if "seed" in job:
+            scatter.seed = job["seed"]
+        scatter.output_mode = job.get("output_mode", scatter.output_mode)
+        scatter.camera = job.get("camera")
+        sources = job["scatter_object"]
+        if not isinstance(sources, list):
+            sources = [sources]
+        scatter.set_scatter_variants(sources, job.get("variant_weights"))
+        scatter.set_target(job["target"])
+        scatter.profile = True
+        if not scatter.plan_check():
+            raise ValueError("invalid scatter parameters")
+        scatter.scatter_check()
+        if job.get("layout"):
+            scatter.export_layout(job["layout"])
+        output_scene = job.get("output_scene", job["scene"])
+        cmds.file(rename=output_scene)
+        cmds.file(save=True, force=True)
+        summary.update({"status": "ok", "output_scene": output_scene,
+                        "instances": len(scatter.last_plan),
+                        "overlap_culled": scatter.overlap_culled,
+                        "camera_culled": scatter.camera_culled,
+                        "profile": scatter.last_profile})
+    except Exception as error:
+        log.exception("Scatter job on %s failed", job["scene"])
+        summary.update({"status": "failed", "error": str(error)})
+    summary["seconds"] = timeit.default_timer() - start
+    return summary
+
+
+def run_job_process(job_path, index, workers):
+    """Runs one job in a separate mayapy process and returns its summary"""
+    handle, report_path = tempfile.mkstemp(suffix=".json")
+    os.close(handle)
+    try:
+        subprocess.call([sys.executable, os.path.abspath(__file__),
+                         job_path, "--job-index", str(index),
+                         "--workers", str(workers),
+                         "--report", report_path])
+        with open(report_path) as report_file:
+            return json.load(report_file)[0]
+    except (IOError, ValueError, IndexError):
+        return {"job": index, "status": "failed",
+                "error": "mayapy process did not report a result"}
+    finally:
+        os.remove(report_path)
+
+
+def run_jobs(job_path, processes=1, workers=1, job_index=None):
+    """Runs the jobs of job_path and returns their summaries in order"""
+    jobs = load_jobs(job_path)
+    indices = range(len(jobs)) if job_index is None else [job_index]
+    if processes > 1:
+        with futures.ThreadPoolExecutor(max_workers=processes) as executor:
+            summaries = list(executor.map(
+                lambda index: run_job_process(job_path, index, workers),
+                indices))
+    else:
+        import maya.standalone
+        maya.standalone.initialize(name="python")
+        summaries = []
+        for index in indices:
+            summary = run_job(jobs[index], workers)
+            summary["job"] = index
+            summaries.append(summary)
+    for summary in summaries:
+        log.info("Job %s %s in %.2fs: %s", summary["job"], summary["status"],
+                 summary.get("seconds", 0.0), summary.get("scene", ""))
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("jobs", help="JSON or YAML job file")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="number of mayapy processes to run jobs in")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="planning worker processes per job")
+    parser.add_argument("--job-index", type=int,
+                        help="only run the job at this index")
+    parser.add_argument("--report", help="write job summaries to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    summaries = run_jobs(args.jobs, args.processes, args.workers,
+                         args.job_index)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(summaries, report_file, indent=2)
+    return 0 if all(summary["status"] == "ok"
+                    for summary in summaries) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Benchmarks ScatterObject.scatter_check against the in-memory backend
+
+Runs end to end scatters over synthetic grid meshes and prints the
+per-phase profile of each run as JSON, for example:
+
+    python scatter_bench.py --sizes 1000 100000 5000000 --latency 0.001
+"""
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from scatter_backend import FakeBackend
+from scatter_object import ScatterObject
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000, 5000000)
+
+
+def synthetic_grid(vertex_count):
+    """Returns points, normals and triangles of a wavy square grid mesh"""
+    side = max(int(round(np.sqrt(vertex_count))), 2)
+    x_coords, z_coords = np.meshgrid(np.arange(side, dtype=np.float64),
+                                     np.arange(side, dtype=np.float64))
+    x_coords, z_coords = x_coords.ravel(), z_coords.ravel()
+    heights = np.sin(x_coords * 0.1) * np.cos(z_coords * 0.1)
+    points = np.stack((x_coords, heights, z_coords), axis=1)
+    normals = np.stack((-0.1 * np.cos(x_coords * 0.1)
+                        * np.cos(z_coords * 0.1),
+                        np.ones_like(x_coords),
+                        0.1 * np.sin(x_coords * 0.1)
+                        * np.sin(z_coords * 0.1)), axis=1)
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    corners = (np.arange(side - 1)[:, np.newaxis] * side
+               + np.arange(side - 1)[np.newaxis, :]).ravel()
+    triangles = np.concatenate((
+        np.stack((corners, corners + side, corners + 1), axis=1),
+        np.stack((corners + 1, corners + side, corners + side + 1), axis=1)))
+    return points, normals, triangles
+
+
+def benchmark_scatter(vertex_count, latency=0.0, **parameters):
+    """Runs one profiled scatter and returns its profile summary"""
+    points, normals, triangles = synthetic_grid(vertex_count)
+    backend = FakeBackend(points, normals, triangles, latency=latency)
+    scatter = ScatterObject(backend)
+    scatter.select_scatter_object()
+    scatter.select_target_object()
+    scatter.scatter_scale_xmin = scatter.scatter_scale_ymin = \
+        scatter.scatter_scale_zmin = 1.0
+    scatter.scatter_scale_xmax = scatter.scatter_scale_ymax = \
+        scatter.scatter_scale_zmax = 1.0
+    for name, value in parameters.items():
+        setattr(scatter, name, value)
+    scatter.profile = True
+    scatter.scatter_check()
+    summary = scatter.last_profile
+    summary["vertices"] = len(points)
+    summary["instances"] = len(scatter.last_plan)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=list(DEFAULT_SIZES),
+                        help="target vertex counts to benchmark")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds slept per backend call")
+    parser.add_argument("--percentage", type=float, default=10,
+                        help="scatter percentage of target vertices")
+    parser.add_argument("--form", type=int, default=0, choices=(0, 1, 2),
+                        help="form_of_scatter mode")
+    parser.add_argument("--output", help="write the results to this file")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    results = [benchmark_scatter(size, latency=args.latency,
+                                 scatter_percentage=args.percentage,
+                                 form_of_scatter=args.form)
+               for size in args.sizes]
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import collections
+import hashlib
+
+import numpy as np
+
+
+def array_digest(*arrays):
+    """Returns a hex digest of the contents, shapes and dtypes of arrays"""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(str((array.dtype.str, array.shape)).encode("utf-8"))
+        digest.update(array.data if array.size else b"")
+    return digest.hexdigest()
+
+
+class PlanCache(object):
+    """LRU cache of planning arrays keyed by content hash
+
+    Entries are dicts of NumPy arrays. The least recently used entries
+    are evicted once their combined size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = collections.OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._entries[key] = entry
+        return entry
+
+    def put(self, key, entry):
+        self.discard(key)
+        size = sum(value.nbytes for value in entry.values())
+        if size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= sum(value.nbytes for value in entry.values())
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
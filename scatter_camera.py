@@ -0,0 +1,89 @@
+"""Camera visibility and distance density for scatter plans
+
+A camera view is a plain dict of one camera on one frame:
+
+    matrix   (4, 4) row-vector world inverse matrix of the camera
+    tan_fov  tangents of half the horizontal and vertical field of view
+    near     near clip distance
+    far      far clip distance
+
+Cameras look down their -Z axis, as in Maya.
+"""
+import numpy as np
+
+
+def camera_space(positions, view):
+    """Returns positions in the camera space of view"""
+    matrix = np.asarray(view["matrix"], dtype=np.float64)
+    return np.dot(positions, matrix[:3, :3]) + matrix[3, :3]
+
+
+def frustum_mask(positions, view, padding=0.0):
+    """Returns a mask of positions inside the frustum of view
+
+    padding widens the frame by that fraction of its size on every side,
+    so instances just outside of frame are kept.
+    """
+    local = camera_space(positions, view)
+    depth = -local[:, 2]
+    tan_x, tan_y = view["tan_fov"]
+    scale = 1.0 + 2.0 * padding
+    return ((depth > view["near"]) & (depth < view["far"])
+            & (np.abs(local[:, 0]) <= depth * tan_x * scale)
+            & (np.abs(local[:, 1]) <= depth * tan_y * scale))
+
+
+def camera_distances(positions, view):
+    """Returns the distance of every position from the camera of view"""
+    return np.linalg.norm(camera_space(positions, view), axis=1)
+
+
+def falloff_density(distances, falloff):
+    """Returns the density at distances of a falloff curve
+
+    falloff is a list of (distance, density) points, linearly
+    interpolated and held flat past either end.
+    """
+    curve = np.asarray(falloff, dtype=np.float64).reshape(-1, 2)
+    return np.interp(distances, curve[:, 0], curve[:, 1])
+
+
+def camera_visibility(positions, views, padding=0.0):
+    """Returns which positions any of views sees and their distance from
+    the nearest camera seeing them, infinite when unseen"""
+    visible = np.zeros(len(positions), dtype=bool)
+    distances = np.full(len(positions), np.inf)
+    for view in views:
+        seen = frustum_mask(positions, view, padding)
+        visible |= seen
+        distances[seen] = np.minimum(
+            distances[seen], camera_distances(positions[seen], view))
+    return visible, distances
+
+
+def check_falloff(falloff):
+    """Returns why a falloff curve is not valid, or None"""
+    curve = np.asarray(falloff, dtype=np.float64)
+    if curve.size == 0:
+        return None
+    if curve.ndim != 2 or curve.shape[1] != 2:
+        return "falloff must be a list of (distance, density) points"
+    if np.any(np.diff(curve[:, 0]) < 0):
+        return "falloff distances must increase"
+    if np.any((curve[:, 1] < 0) | (curve[:, 1] > 1)):
+        return "falloff densities must be between 0 and 1"
+    return None
+
+
+def check_frames(frames):
+    """Returns why a (start, end) or (start, end, step) frame range is not
+    valid, or None"""
+    if frames is None:
+        return None
+    if not 2 <= len(frames) <= 3:
+        return "frames must be (start, end) or (start, end, step)"
+    if frames[0] > frames[1]:
+        return "frame range starts after it ends"
+    if len(frames) > 2 and frames[2] <= 0:
+        return "frame step must be greater than 0"
+    return None
@@ -0,0 +1,63 @@
+"""Binary scatter layout files
+
+A layout file is a small header followed by a packed LAYOUT_DTYPE record
+per instance:
+
+    8 bytes   magic, b"SCATLAY1"
+    4 bytes   little-endian uint32 length of the JSON metadata
+    n bytes   UTF-8 JSON metadata (count, sources, settings)
+    padding   zero bytes up to a 16 byte boundary
+    records   count LAYOUT_DTYPE records
+
+Records are read back through a memory map, so large layouts are not
+loaded into Python objects.
+"""
+import json
+import struct
+
+import numpy as np
+
+LAYOUT_MAGIC = b"SCATLAY1"
+LAYOUT_DTYPE = np.dtype([("translate", "<f4", 3),
+                         ("rotate", "<f4", 3),
+                         ("scale", "<f4", 3),
+                         ("variant", "<u4")])
+
+
+def plan_to_layout(plan):
+    """Returns the LAYOUT_DTYPE records of a scatter plan"""
+    records = np.zeros(len(plan), dtype=LAYOUT_DTYPE)
+    for name in ("translate", "rotate", "scale"):
+        records[name] = plan[name]
+    if "variant" in plan.dtype.names:
+        records["variant"] = plan["variant"]
+    return records
+
+
+def write_layout(path, plan, sources=(), settings=None):
+    """Writes plan to path as a binary layout file"""
+    records = plan_to_layout(plan)
+    metadata = json.dumps({"count": len(records), "sources": list(sources),
+                           "settings": settings or {}}).encode("utf-8")
+    header = LAYOUT_MAGIC + struct.pack("<I", len(metadata)) + metadata
+    header += b"\0" * (-len(header) % 16)
+    with open(path, "wb") as layout_file:
+        layout_file.write(header)
+        records.tofile(layout_file)
+
+
+def read_layout(path):
+    """Returns the metadata and memory-mapped records of a layout file"""
+    with open(path, "rb") as layout_file:
+        magic = layout_file.read(len(LAYOUT_MAGIC))
+        if magic != LAYOUT_MAGIC:
+            raise ValueError("{} is not a scatter layout file".format(path))
+        size = struct.unpack("<I", layout_file.read(4))[0]
+        metadata = json.loads(layout_file.read(size).decode("utf-8"))
+    offset = len(LAYOUT_MAGIC) + 4 + size
+    offset += -offset % 16
+    if metadata["count"] == 0:
+        return metadata, np.zeros(0, dtype=LAYOUT_DTYPE)
+    records = np.memmap(path, dtype=LAYOUT_DTYPE, mode="r", offset=offset,
+                        shape=(metadata["count"],))
+    return metadata, records
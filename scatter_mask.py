@@ -0,0 +1,220 @@
+"""Density masks evaluated over sampled scatter points
+
+A mask is a plain dict, so masks are stored and passed around with the
+other scatter parameters, for example
+
+    {"type": "slope", "min": 0, "max": 30, "falloff": 5}
+
+Mask types and their keys:
+
+    slope         min, max angle between the normal and world up, degrees
+    height        min, max world Y position
+    noise         size of the noise features, min, max noise value, seed
+    vertex_color  channel of the target's vertex colors, "r" "g" "b" "a"
+    texture       path of an image, channel, projection "uv" or "planar"
+
+Range masks take falloff, the width of the linear ramp outside of min
+and max. Color and texture masks use the channel value as density. All
+masks take invert. Every mask evaluates to a density between 0 and 1
+per point and a list of masks chains by multiplying their densities.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+MASK_TYPES = ("slope", "height", "noise", "vertex_color", "texture")
+CHANNELS = "rgba"
+RANGE_DEFAULTS = {"slope": (0.0, 90.0),
+                  "height": (-np.inf, np.inf),
+                  "noise": (0.5, 1.0)}
+NOISE_PRIMES = (0x8da6b343, 0xd8163841, 0xcb1ab31f)
+TEXTURE_MMAP_BYTES = 64 * 1024 * 1024
+
+_textures = {}
+
+
+def range_density(values, low, high, falloff=0.0):
+    """Returns 1 for values in [low, high], ramping to 0 over falloff"""
+    outside = np.maximum(low - values, values - high)
+    if falloff > 0:
+        return np.clip(1.0 - outside / falloff, 0.0, 1.0)
+    return (outside <= 0).astype(np.float64)
+
+
+def value_noise(positions, size, seed=0):
+    """Returns smooth 3D value noise in [0, 1) at positions
+
+    Hashed random values on a lattice of size spaced cells are blended
+    trilinearly with a smoothstep, so features are about size across.
+    Works in float32 on per-axis hashes to stay fast on millions of
+    points.
+    """
+    scaled = np.ascontiguousarray(positions.T, dtype=np.float32)
+    scaled *= np.float32(1.0 / size)
+    cells = np.floor(scaled)
+    blend = scaled - cells
+    blend *= blend * (np.float32(3.0) - np.float32(2.0) * blend)
+    cells = cells.astype(np.int32).view(np.uint32)
+    salt = np.uint32(seed * 0x165667b1 & 0xffffffff)
+    hashes = []
+    for axis, prime in enumerate(NOISE_PRIMES):
+        low = cells[axis] * np.uint32(prime)
+        high = low + np.uint32(prime)
+        if axis == 0:
+            low ^= salt
+            high ^= salt
+        hashes.append((low, high))
+    planes = []
+    for z in (0, 1):
+        rows = [_lerp(_corner_values(hashes, 0, y, z),
+                      _corner_values(hashes, 1, y, z), blend[0])
+                for y in (0, 1)]
+        planes.append(_lerp(rows[0], rows[1], blend[1]))
+    noise = _lerp(planes[0], planes[1], blend[2])
+    noise *= np.float32(1.0 / 2 ** 32)
+    return noise
+
+
+def _corner_values(hashes, x, y, z):
+    hashed = hashes[0][x] ^ hashes[1][y]
+    hashed ^= hashes[2][z]
+    hashed ^= hashed >> np.uint32(13)
+    hashed *= np.uint32(0x5bd1e995)
+    hashed ^= hashed >> np.uint32(15)
+    return hashed.astype(np.float32)
+
+
+def _lerp(low, high, blend):
+    high -= low
+    high *= blend
+    high += low
+    return high
+
+
+def load_texture(path, read_image=None):
+    """Returns the pixels of an image file as a (height, width, channels)
+    array with row 0 at v = 0
+
+    .npy files are memory-mapped. Other formats are decoded once with
+    read_image, and images over TEXTURE_MMAP_BYTES are kept as a .npy in
+    the temp directory and memory-mapped from there. The array is reused
+    until the file changes.
+    """
+    path = os.path.abspath(path)
+    modified = os.path.getmtime(path)
+    cached = _textures.get(path)
+    if cached is not None and cached[0] == modified:
+        return cached[1]
+    if path.lower().endswith(".npy"):
+        pixels = np.load(path, mmap_mode="r")
+    else:
+        if read_image is None:
+            raise ValueError("No image reader for {}".format(path))
+        cache_path = os.path.join(tempfile.gettempdir(),
+                                  "scatter_texture_{}.npy".format(
+                                      hashlib.sha1(repr((path, modified))
+                                                   .encode("utf-8"))
+                                      .hexdigest()))
+        if os.path.exists(cache_path):
+            pixels = np.load(cache_path, mmap_mode="r")
+        else:
+            pixels = read_image(path)
+            if pixels.nbytes >= TEXTURE_MMAP_BYTES:
+                np.save(cache_path, pixels)
+                pixels = np.load(cache_path, mmap_mode="r")
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, np.newaxis]
+    _textures[path] = (modified, pixels)
+    return pixels
+
+
+def texture_lookup(pixels, uvs, channel=0):
+    """Returns the nearest pixel's channel at uvs, scaled to [0, 1]
+
+    UVs wrap, so the texture tiles outside of 0 to 1.
+    """
+    height, width = pixels.shape[:2]
+    columns = np.minimum((np.mod(uvs[:, 0], 1.0) * width).astype(np.int64),
+                         width - 1)
+    rows = np.minimum((np.mod(uvs[:, 1], 1.0) * height).astype(np.int64),
+                      height - 1)
+    values = pixels[rows, columns, min(channel, pixels.shape[2] - 1)]
+    if np.issubdtype(pixels.dtype, np.integer):
+        return values / float(np.iinfo(pixels.dtype).max)
+    return values.astype(np.float64)
+
+
+def planar_uvs(positions, points):
+    """Returns XZ positions mapped to 0 to 1 over the bounds of points"""
+    low = points[:, [0, 2]].min(axis=0)
+    size = np.maximum(points[:, [0, 2]].max(axis=0) - low, 1e-12)
+    return np.clip((positions[:, [0, 2]] - low) / size, 0.0, 1.0 - 1e-9)
+
+
+def check_mask(mask):
+    """Returns why mask is not valid, or None"""
+    if mask.get("type") not in MASK_TYPES:
+        return "type must be one of {}".format(", ".join(MASK_TYPES))
+    if mask["type"] in RANGE_DEFAULTS and \
+            mask_range(mask)[0] > mask_range(mask)[1]:
+        return "min is greater than max"
+    if mask.get("falloff", 0) < 0:
+        return "falloff is negative"
+    if mask["type"] == "noise" and mask.get("size", 1.0) <= 0:
+        return "size must be greater than 0"
+    if mask.get("channel", "r") not in CHANNELS:
+        return "channel must be one of r, g, b or a"
+    if mask["type"] == "texture" and not mask.get("path"):
+        return "no texture path"
+    return None
+
+
+def mask_range(mask):
+    """Returns the min and max of a range mask"""
+    low, high = RANGE_DEFAULTS[mask["type"]]
+    return mask.get("min", low), mask.get("max", high)
+
+
+def mask_density(mask, planner):
+    """Returns the density of mask at the planner's sampled points"""
+    mask_type = mask["type"]
+    falloff = mask.get("falloff", 0.0)
+    channel = CHANNELS.index(mask.get("channel", "r"))
+    if mask_type == "slope":
+        cosines = np.clip(planner.scatter_normals[:, 1], -1.0, 1.0)
+        density = range_density(np.degrees(np.arccos(cosines)),
+                                *mask_range(mask), falloff=falloff)
+    elif mask_type == "height":
+        density = range_density(planner.scatter_positions[:, 1],
+                                *mask_range(mask), falloff=falloff)
+    elif mask_type == "noise":
+        density = range_density(
+            value_noise(planner.scatter_positions, mask.get("size", 1.0),
+                        mask.get("seed", 0)),
+            *mask_range(mask), falloff=falloff)
+    elif mask_type == "vertex_color":
+        density = np.clip(planner.point_attribute(
+            planner.target_colors[:, channel]), 0.0, 1.0)
+    else:
+        if mask.get("projection", "uv") == "planar" or \
+                len(planner.target_uvs) == 0:
+            uvs = planar_uvs(planner.scatter_positions,
+                             planner.target_points[
+                                 planner.target_vertex_ids()])
+        else:
+            uvs = planner.point_attribute(planner.target_uvs)
+        density = texture_lookup(planner.mask_texture(mask["path"]), uvs,
+                                 channel)
+    if mask.get("invert"):
+        density = 1.0 - density
+    return density
+
+
+def chain_density(masks, planner):
+    """Returns the product of the densities of masks"""
+    density = np.ones(len(planner.scatter_positions))
+    for mask in masks:
+        density *= mask_density(mask, planner)
+    return density
@@ -0,0 +1,469 @@
+import json
+import logging
+
+import numpy as np
+
+from scatter_attach import SurfaceAttachment
+from scatter_backend import CountingBackend, MayaBackend
+from scatter_io import read_layout, write_layout
+from scatter_mask import load_texture
+from scatter_plan import (ScatterPlanner, id_ranges, ids_from_ranges,
+                          region_mask)
+from scatter_profile import ScatterProfiler
+
+log = logging.getLogger(__name__)
+
+SCATTER_STATE_NAMES = ("last_plan", "scatter_group", "scatter_instances",
+                       "applied_scatter_key", "attachment",
+                       "scatter_variants", "scatter_target_def",
+                       "scatter_target_ids", "camera", "output_mode")
+
+
+class ScatterObject(ScatterPlanner):
+    """Functionality to scatter UI and random rotation/scale"""
+
+    def __init__(self, backend=None):
+        super(ScatterObject, self).__init__()
+        self.backend = MayaBackend() if backend is None else backend
+        self.scatter_obj_def = None
+        self.current_object_def = None
+        self.scatter_variants = []
+        self.scatter_target_def = None
+        self.current_target_def = None
+        self.output_mode = "transforms"
+        self.camera = None
+        self.reselect_samples = False
+        self.scatter_instances = []
+        self.scatter_group = None
+        self.chunk_size = 5000
+        self.incremental_rescatter = True
+        self.applied_scatter_key = None
+        self.last_plan = None
+        self.created_group = None
+        self.replaced_plan = None
+        self.replaced_settings = None
+        self.rewritten_count = 0
+        self.attachment = None
+        self.time_callback = None
+        self.profile = False
+        self.last_profile = None
+        self.applied_state = self.scatter_state()
+
+    def plan_check(self):
+        """Also checks there are sources with one weight per variant"""
+        if not self.scatter_variants:
+            log.warning("No objects are set to scatter. Select one or more "
+                        "objects and then try again.")
+            return False
+        if len(self.variant_weights) != len(self.scatter_variants):
+            log.warning("%d variant weights given for %d scatter objects, "
+                        "weighting them equally.", len(self.variant_weights),
+                        len(self.scatter_variants))
+            self.variant_weights = [1.0] * len(self.scatter_variants)
+        return super(ScatterObject, self).plan_check()
+
+    def scatter_check(self):
+        if self.plan_check():
+            if self.profile:
+                self.profiled_scatter()
+            else:
+                self.scatter_check_internal_align_check()
+    def scatter_check_internal_align_check(self):
+        for _ in self.scatter_chunks():
+            pass
+
+    def scatter_chunks(self):
+        """Plans, then applies the scatter chunk by chunk
+
+        Yields (instances done, instances total) after every chunk so a
+        caller can report progress, keep its event loop alive or stop
+        early with cancel_scatter. The whole run is one undo chunk with
+        viewport refresh suspended.
+        """
+        plan = self.plan_target_mesh()
+        previous_plan = self.last_plan
+        in_place = self.can_update_in_place(plan)
+        self.last_plan = plan
+        self.attachment = SurfaceAttachment(
+            plan, self.target_triangles, len(self.target_points),
+            self.form_of_scatter, self.obj_pos_offset)
+        if self.reselect_samples and len(self.scatter_vertex_ids):
+            with self.profile_phase("reselect"):
+                self.backend.select_vertices(self.scatter_target_mesh(),
+                                             self.scatter_vertex_ids)
+        self.created_group = None
+        self.replaced_plan = None
+        if in_place:
+            self.replaced_plan = previous_plan
+            progress_chunks = self.update_plan_chunks(plan)
+        else:
+            progress_chunks = self.apply_plan_chunks(plan)
+        for progress in self.undoable_chunks(progress_chunks):
+            yield progress
+        self.applied_state = self.scatter_state()
+
+    def undoable_chunks(self, progress_chunks):
+        """Runs progress_chunks in one undo chunk with refresh suspended"""
+        self.backend.open_undo_chunk("scatter")
+        self.backend.suspend_refresh(True)
+        try:
+            for progress in progress_chunks:
+                yield progress
+        finally:
+            self.backend.suspend_refresh(False)
+            self.backend.close_undo_chunk()
+
+    def export_layout(self, path):
+        """Writes the last planned scatter to a binary layout file"""
+        if self.last_plan is None:
+            log.warning("Nothing to export, scatter first and then try "
+                        "again.")
+            return False
+        write_layout(path, self.last_plan, self.scatter_variants,
+                     self.scatter_settings())
+        return True
+
+    def import_layout_chunks(self, path):
+        """Re-instances a layout file chunk by chunk
+
+        The records stay memory-mapped and are only read one chunk at a
+        time. Yields (instances done, instances total).
+        """
+        self.created_group = None
+        self.replaced_plan = None
+        metadata, records = read_layout(path)
+        if metadata["sources"]:
+            self.set_scatter_variants(metadata["sources"])
+        self.attachment = None
+        for progress in self.undoable_chunks(
+                self.apply_plan_chunks(records, metadata["settings"])):
+            yield progress
+        self.applied_state = self.scatter_state()
+
+    def import_layout(self, path):
+        for _ in self.import_layout_chunks(path):
+            pass
+        return self.scatter_group
+
+    def scatter_state(self):
+        """Returns the scatter state and parameters a cancelled run puts
+        back
+
+        It is recorded whenever a run completes, since the parameters of
+        the next run are set before it starts.
+        """
+        state = dict((name, getattr(self, name))
+                     for name in SCATTER_STATE_NAMES)
+        state["scatter_instances"] = list(self.scatter_instances)
+        state["parameters"] = self.scatter_parameters()
+        return state
+
+    def cancel_scatter(self):
+        """Reverts a scatter that was stopped early
+
+        A group the run created is deleted. A stopped in-place rescatter
+        leaves the previous scatter's group in place and writes its
+        transforms and settings back onto the instances already rewritten.
+        Either way the plan, instances, attachment, target and parameters
+        of the last completed scatter are restored.
+        """
+        if self.created_group is not None:
+            self.backend.delete_nodes([self.created_group])
+            self.created_group = None
+        elif self.replaced_plan is not None:
+            plan = self.replaced_plan[:self.rewritten_count]
+            self.backend.open_undo_chunk("cancel scatter")
+            try:
+                self.backend.set_transforms(
+                    self.scatter_instances[:len(plan)], plan["translate"],
+                    plan["rotate"], plan["scale"], undoable=True)
+                self.backend.set_scatter_settings(self.scatter_group,
+                                                  self.replaced_settings)
+            finally:
+                self.backend.close_undo_chunk()
+            self.replaced_plan = None
+        self.set_scatter_parameters(self.applied_state["parameters"])
+        for name in SCATTER_STATE_NAMES:
+            setattr(self, name, self.applied_state[name])
+        self.scatter_instances = list(self.scatter_instances)
+
+    def update_attached_instances(self):
+        """Moves the last scatter's instances onto the target's current
+        shape
+
+        The target points and normals are read in bulk and every instance
+        transform is recomputed from its attachment in one vectorized
+        pass. Returns False when nothing is attached or the target's
+        vertex count changed.
+        """
+        if self.attachment is None or \
+                not self.backend.node_exists(self.scatter_group):
+            return False
+        with self.profile_phase("mesh_read"):
+            points, normals = self.backend.mesh_arrays(
+                self.scatter_target_mesh())
+        if len(points) != self.attachment.vertex_count:
+            log.warning("%s changed from %d to %d vertices, scatter again "
+                        "to reattach instances.", self.scatter_target_mesh(),
+                        self.attachment.vertex_count, len(points))
+            return False
+        with self.profile_phase("orientation"):
+            translates, rotates, scales = self.attachment.transforms(
+                points, normals)
+        with self.profile_phase("transform_writes"):
+            if self.output_mode == "instancer":
+                self.backend.set_instancer_transforms(
+                    self.scatter_instances[0], translates, rotates, scales)
+            else:
+                self.backend.set_transforms(self.scatter_instances,
+                                            translates, rotates, scales)
+        return True
+
+    def follow_target(self, follow=True):
+        """Updates the attached instances on every time change while
+        follow is on"""
+        if self.time_callback is not None:
+            self.backend.remove_callback(self.time_callback)
+            self.time_callback = None
+        if follow:
+            self.time_callback = self.backend.add_time_callback(
+                self.update_attached_instances)
+
+    def profiled_scatter(self):
+        """Scatters while recording per-phase timings and backend calls"""
+        backend = self.backend
+        self.backend = CountingBackend(backend)
+        self.profiler = ScatterProfiler(self.backend.calls)
+        try:
+            self.scatter_check_internal_align_check()
+        finally:
+            self.backend = backend
+            self.last_profile = self.profiler.summary()
+            log.info("Scatter profile:\n%s", self.profiler.report())
+            self.profiler = None
+
+    def plan_target_mesh(self):
+        """Reads the target mesh arrays and plans the scatter over them"""
+        with self.profile_phase("mesh_read"):
+            points, normals = self.backend.mesh_arrays(
+                self.scatter_target_mesh())
+            triangles = None
+            if self.sample_mode == "surface":
+                triangles = self.backend.mesh_triangles(
+                    self.scatter_target_mesh())
+            mask_types = set(mask["type"] for mask in self.density_masks)
+            if "vertex_color" in mask_types:
+                self.target_colors = self.backend.mesh_vertex_colors(
+                    self.scatter_target_mesh())
+            if "texture" in mask_types:
+                self.target_uvs = self.backend.mesh_vertex_uvs(
+                    self.scatter_target_mesh())
+            self.camera_views = []
+            if self.camera:
+                self.camera_views = self.backend.camera_views(
+                    self.camera, self.camera_frame_list())
+            if self.overlap_mode != "none":
+                self.variant_bounds = np.array(
+                    [self.backend.object_bounds(source)
+                     for source in self.scatter_variants])
+        return self.plan(points, normals, triangles)
+
+    def mask_texture(self, path):
+        """Returns a mask texture, decoding images through the backend"""
+        return load_texture(path, self.backend.read_image)
+
+    def apply_plan(self, plan):
+        """Pushes a scatter plan into the scene"""
+        for _ in self.apply_plan_chunks(plan):
+            pass
+        return self.scatter_group
+
+    def apply_plan_chunks(self, plan, settings=None):
+        """Creates the plan's instances chunk_size at a time
+
+        Without settings the plan is the current settings' scatter, which
+        a later rescatter may rewrite in place. Plans stored with other
+        settings, such as imported layouts, are never reused.
+        Yields (instances done, instances total) after every chunk.
+        """
+        with self.profile_phase("instancing"):
+            self.scatter_group = self.backend.create_group("instance_group#")
+            self.created_group = self.scatter_group
+            self.scatter_instances = []
+            self.applied_scatter_key = None
+            if settings is None:
+                self.applied_scatter_key = self.scatter_key()
+                settings = self.scatter_settings()
+            self.backend.set_scatter_settings(self.scatter_group,
+                                              json.dumps(settings))
+            if self.output_mode == "instancer":
+                self.scatter_instances.append(self.backend.create_instancer(
+                    self.scatter_variants, plan["translate"], plan["rotate"],
+                    plan["scale"], self.scatter_group, plan["variant"]))
+        if self.output_mode == "instancer":
+            yield len(plan), len(plan)
+            return
+        chunk_size = max(int(self.chunk_size), 1)
+        variant_counts = [0] * len(self.scatter_variants)
+        for start in range(0, len(plan), chunk_size):
+            chunk = plan[start:start + chunk_size]
+            self.create_scatter_instances(chunk, variant_counts)
+            yield start + len(chunk), len(plan)
+
+    def scatter_settings(self):
+        """Returns everything needed to regenerate the current scatter"""
+        settings = self.scatter_parameters()
+        settings.update({"scatter_objects": self.scatter_variants,
+                         "scatter_target": self.scatter_target_def,
+                         "scatter_target_ids": id_ranges(
+                             self.scatter_target_ids),
+                         "camera": self.camera,
+                         "output_mode": self.output_mode})
+        return settings
+
+    def load_scatter_settings(self, group):
+        """Restores the seed and parameters stored on a scatter group"""
+        settings = self.backend.scatter_settings(group)
+        if settings is None:
+            log.warning("%s has no stored scatter settings.", group)
+            return False
+        settings = json.loads(settings)
+        self.set_scatter_variants(settings.pop("scatter_objects"))
+        self.set_target(settings.pop("scatter_target"),
+                        ids_from_ranges(settings.pop("scatter_target_ids")))
+        self.camera = settings.pop("camera", None)
+        self.output_mode = settings.pop("output_mode")
+        self.set_scatter_parameters(settings)
+        return True
+
+    def regenerate_region(self, group, lower, upper):
+        """Recreates the instances of group's scatter inside a box
+
+        The scatter is re-planned from the settings stored on group and
+        only the instances between lower and upper are created, in a new
+        group. Returns that group, or None when group has no settings.
+        """
+        if not self.load_scatter_settings(group) or not self.plan_check():
+            return None
+        plan = self.plan_target_mesh()
+        plan = plan[region_mask(plan, lower, upper)]
+        self.attachment = None
+        for _ in self.undoable_chunks(
+                self.apply_plan_chunks(plan, self.scatter_settings())):
+            pass
+        self.applied_state = self.scatter_state()
+        return self.scatter_group
+
+    def scatter_key(self):
+        """Returns what must match for instances to be reused in place"""
+        return (self.last_sample_key, tuple(self.scatter_variants),
+                tuple(self.variant_weights), self.output_mode)
+
+    def can_update_in_place(self, plan):
+        """Returns True when plan only changes the last scatter's transforms
+
+        That is the case when the target mesh, sampling parameters,
+        scatter objects, variant weights and output are unchanged, every
+        instance keeps its variant and the instances still exist.
+        """
+        return (self.incremental_rescatter
+                and self.output_mode == "transforms"
+                and self.applied_scatter_key == self.scatter_key()
+                and len(self.scatter_instances) == len(plan)
+                and np.array_equal(plan["variant"],
+                                   self.last_plan["variant"])
+                and self.backend.node_exists(self.scatter_group))
+
+    def update_plan_chunks(self, plan):
+        """Rewrites the transforms of the existing instances in place
+
+        The writes are undoable, so undo after a rescatter restores the
+        previous layout. Yields (instances done, instances total) after
+        every chunk.
+        """
+        self.replaced_settings = self.backend.scatter_settings(
+            self.scatter_group)
+        self.rewritten_count = 0
+        self.backend.set_scatter_settings(
+            self.scatter_group, json.dumps(self.scatter_settings()))
+        chunk_size = max(int(self.chunk_size), 1)
+        for start in range(0, len(plan), chunk_size):
+            chunk = plan[start:start + chunk_size]
+            with self.profile_phase("transform_writes"):
+                self.backend.set_transforms(
+                    self.scatter_instances[start:start + chunk_size],
+                    chunk["translate"], chunk["rotate"], chunk["scale"],
+                    undoable=True)
+            self.rewritten_count = start + len(chunk)
+            yield start + len(chunk), len(plan)
+
+    def create_scatter_instances(self, chunk, variant_counts):
+        """Creates a plan chunk's instances in bulk, one pass per variant
+
+        variant_counts holds how many instances of each variant exist so
+        far. It numbers the new instances and is advanced past them.
+        """
+        nodes = np.empty(len(chunk), dtype=object)
+        for variant in np.unique(chunk["variant"]):
+            indices = np.flatnonzero(chunk["variant"] == variant)
+            with self.profile_phase("instancing"):
+                created = self.backend.create_instances(
+                    self.scatter_variants[variant], len(indices),
+                    self.scatter_group, variant_counts[variant] + 1)
+            with self.profile_phase("transform_writes"):
+                self.backend.set_transforms(
+                    created, chunk["translate"][indices],
+                    chunk["rotate"][indices], chunk["scale"][indices])
+            nodes[indices] = created
+            variant_counts[variant] += len(indices)
+        self.scatter_instances.extend(nodes.tolist())
+        return nodes.tolist()
+
+    def scatter_target_mesh(self):
+        return self.scatter_target_def
+
+    def select_target_object(self):
+        self.scatter_target_def, self.scatter_target_ids = \
+            self.backend.selected_vertices()
+        if self.scatter_target_def is None:
+            self.current_target_def = ''
+            log.warning("No object or vertices are currently selected for "
+                        "scatter destination. Select one or more vertices, or "
+                        "an object and then try again.")
+        else:
+            self.current_target_def = "{} ({} vertices)".format(
+                self.scatter_target_def, len(self.scatter_target_ids))
+    def set_target(self, mesh, vertex_ids=None):
+        """Targets vertex_ids of mesh, or all of its vertices, directly"""
+        if vertex_ids is None:
+            vertex_ids = np.arange(self.backend.vertex_count(mesh),
+                                   dtype=np.int64)
+        self.scatter_target_def = mesh
+        self.scatter_target_ids = np.asarray(vertex_ids, dtype=np.int64)
+        self.current_target_def = "{} ({} vertices)".format(
+            mesh, len(self.scatter_target_ids))
+
+    def set_scatter_variants(self, sources, weights=None):
+        """Scatters every one of sources, drawn by weights or equally"""
+        self.scatter_obj_def = list(sources)
+        self.scatter_variants = list(sources)
+        self.current_object_def = ", ".join(self.scatter_variants) or None
+        if weights is not None:
+            self.variant_weights = list(weights)
+        elif len(self.variant_weights) != len(self.scatter_variants):
+            self.variant_weights = [1.0] * len(self.scatter_variants)
+
+    def select_camera(self):
+        """Culls the scatter to the last selected camera"""
+        selected = self.backend.selected_objects()
+        self.camera = selected[-1] if selected else None
+        if self.camera is None:
+            log.warning("No camera is currently selected, scattering "
+                        "without camera culling.")
+
+    def select_scatter_object(self):
+        self.set_scatter_variants(self.backend.selected_objects())
+        if not self.scatter_variants:
+            log.warning("No objects are currently selected for object being"
+                        " scattered. Select one or more objects and then "
+                        "try again.")
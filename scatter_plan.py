@@ -0,0 +1,997 @@
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent import futures
+
+import numpy as np
+
+from scatter_cache import PlanCache, array_digest
+from scatter_camera import (camera_visibility, check_falloff, check_frames,
+                            falloff_density)
+from scatter_mask import chain_density, check_mask, load_texture
+from scatter_profile import NULL_PHASE
+
+log = logging.getLogger(__name__)
+
+PLANNING_CHUNK_VERTICES = 50000
+
+PLAN_DTYPE = np.dtype([("translate", np.float64, 3),
+                       ("rotate", np.float64, 3),
+                       ("scale", np.float64, 3),
+                       ("normal", np.float64, 3),
+                       ("vertex", np.int64),
+                       ("variant", np.int32),
+                       ("face", np.int64),
+                       ("barycentric", np.float64, 3)])
+
+PARAMETER_NAMES = ("scatter_x_min", "scatter_x_max", "scatter_y_min",
+                   "scatter_y_max", "scatter_z_min", "scatter_z_max",
+                   "scatter_scale_xmin", "scatter_scale_xmax",
+                   "scatter_scale_ymin", "scatter_scale_ymax",
+                   "scatter_scale_zmin", "scatter_scale_zmax",
+                   "scatter_percentage", "form_of_scatter", "obj_pos_offset",
+                   "sample_mode", "surface_sample_count", "min_spacing",
+                   "spacing_from_scale", "seed", "planning_workers",
+                   "variant_weights", "density_masks", "overlap_mode",
+                   "overlap_min_scale", "camera_padding", "camera_falloff",
+                   "camera_frames")
+OVERLAP_MODES = ("none", "sphere", "box")
+NEIGHBOUR_OFFSETS = sorted(((x, y, z) for x in (-1, 0, 1)
+                            for y in (-1, 0, 1) for z in (-1, 0, 1)),
+                           key=lambda offset: sum(map(abs, offset)))
+OVERLAP_BATCH = 32768
+
+
+def build_plan(translates, rotates, scales, normals, vertex_ids=None,
+               variants=None, faces=None, barycentrics=None):
+    """Packs per-instance arrays into a PLAN_DTYPE structured array
+
+    vertex is -1 for surface samples and face -1 for vertex samples.
+    """
+    plan = np.zeros(len(translates), dtype=PLAN_DTYPE)
+    plan["translate"] = translates
+    plan["rotate"] = rotates
+    plan["scale"] = scales
+    plan["normal"] = normals
+    plan["vertex"] = -1 if vertex_ids is None or not len(vertex_ids) \
+        else vertex_ids
+    if variants is not None:
+        plan["variant"] = variants
+    plan["face"] = -1 if faces is None or not len(faces) else faces
+    if barycentrics is not None and len(barycentrics):
+        plan["barycentric"] = barycentrics
+    return plan
+
+
+def region_mask(plan, lower, upper):
+    """Returns a mask of plan instances inside the box lower to upper
+
+    Plans are reproducible from their seed, so re-planning with the same
+    seed and keeping this mask regenerates just that part of a scatter.
+    """
+    translates = plan["translate"]
+    return np.all((translates >= lower) & (translates <= upper), axis=1)
+
+
+def id_ranges(ids):
+    """Returns ids as a flat [start, stop, start, stop, ...] list of runs
+
+    Runs of consecutive ids collapse to one half-open pair, so a whole
+    mesh or a contiguous selection stores in a few numbers. The order of
+    ids is kept.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if len(ids) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = ids[np.concatenate(([0], breaks))]
+    stops = ids[np.concatenate((breaks - 1, [len(ids) - 1]))] + 1
+    return np.stack((starts, stops), axis=1).ravel().tolist()
+
+
+def ids_from_ranges(ranges):
+    """Returns the int64 id array of an id_ranges list"""
+    pairs = np.asarray(ranges, dtype=np.int64).reshape(-1, 2)
+    if len(pairs) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate([np.arange(start, stop, dtype=np.int64)
+                           for start, stop in pairs])
+
+
+def normal_alignment_rotations(normals, spins=None):
+    """Returns (N, 3) XYZ euler rotations in degrees aiming +X at normals
+
+    Matches the orientation of a default normalConstraint (aim X, up Y,
+    world up Y). Optional spins in degrees rotate each instance around
+    its normal before alignment.
+    """
+    matrices = normal_frames(normals)
+    if spins is not None:
+        angles = np.radians(spins)
+        cos, sin = np.cos(angles), np.sin(angles)
+        spin_matrices = np.zeros_like(matrices)
+        spin_matrices[:, 0, 0] = 1.0
+        spin_matrices[:, 1, 1] = cos
+        spin_matrices[:, 1, 2] = sin
+        spin_matrices[:, 2, 1] = -sin
+        spin_matrices[:, 2, 2] = cos
+        matrices = np.matmul(spin_matrices, matrices)
+    return matrix_to_euler_xyz(matrices)
+
+
+def normal_frames(normals):
+    """Returns (N, 3, 3) row-vector rotation matrices aiming +X at normals
+    with Y up as far as the normal allows"""
+    aim = normals / np.maximum(
+        np.linalg.norm(normals, axis=1), 1e-12)[:, np.newaxis]
+    side = np.cross(aim, (0.0, 1.0, 0.0))
+    parallel = np.linalg.norm(side, axis=1) < 1e-6
+    side[parallel] = np.cross(aim[parallel], (0.0, 0.0, 1.0))
+    side /= np.linalg.norm(side, axis=1)[:, np.newaxis]
+    up = np.cross(side, aim)
+    return np.stack((aim, up, side), axis=1)
+
+
+def matrix_to_euler_xyz(matrices):
+    """Returns XYZ euler degrees for (N, 3, 3) row-vector rotation matrices"""
+    y_rot = np.arcsin(np.clip(-matrices[:, 0, 2], -1.0, 1.0))
+    x_rot = np.arctan2(matrices[:, 1, 2], matrices[:, 2, 2])
+    z_rot = np.arctan2(matrices[:, 0, 1], matrices[:, 0, 0])
+    gimbal = np.abs(matrices[:, 0, 2]) > 1.0 - 1e-9
+    x_rot[gimbal] = np.arctan2(-matrices[gimbal, 2, 1],
+                               matrices[gimbal, 1, 1])
+    z_rot[gimbal] = 0.0
+    return np.degrees(np.stack((x_rot, y_rot, z_rot), axis=1))
+
+
+def euler_xyz_to_matrix(rotates):
+    """Returns (N, 3, 3) row-vector rotation matrices for XYZ euler degrees
+
+    The inverse of matrix_to_euler_xyz.
+    """
+    x_rot, y_rot, z_rot = np.radians(rotates).T
+    matrices = np.zeros((len(rotates), 3, 3))
+    cos_x, sin_x = np.cos(x_rot), np.sin(x_rot)
+    cos_y, sin_y = np.cos(y_rot), np.sin(y_rot)
+    cos_z, sin_z = np.cos(z_rot), np.sin(z_rot)
+    matrices[:, 0, 0] = cos_y * cos_z
+    matrices[:, 0, 1] = cos_y * sin_z
+    matrices[:, 0, 2] = -sin_y
+    matrices[:, 1, 0] = sin_x * sin_y * cos_z - cos_x * sin_z
+    matrices[:, 1, 1] = sin_x * sin_y * sin_z + cos_x * cos_z
+    matrices[:, 1, 2] = sin_x * cos_y
+    matrices[:, 2, 0] = cos_x * sin_y * cos_z + sin_x * sin_z
+    matrices[:, 2, 1] = cos_x * sin_y * sin_z - sin_x * cos_z
+    matrices[:, 2, 2] = cos_x * cos_y
+    return matrices
+
+
+def instance_bounds(plan, variant_bounds, boxes=False):
+    """Returns the bound centers and extents of planned instances
+
+    variant_bounds holds the (min, max) object space bounds of every
+    variant. Extents are bounding sphere radii, or world axis aligned box
+    half extents with boxes. Both follow each instance's rotation and
+    scale.
+    """
+    bounds = variant_bounds[plan["variant"]] * plan["scale"][:, np.newaxis]
+    matrices = euler_xyz_to_matrix(plan["rotate"])
+    offsets = np.matmul(0.5 * (bounds[:, 0] + bounds[:, 1])[:, np.newaxis],
+                        matrices)[:, 0]
+    half_sizes = 0.5 * np.abs(bounds[:, 1] - bounds[:, 0])
+    if boxes:
+        extents = np.matmul(half_sizes[:, np.newaxis],
+                            np.abs(matrices))[:, 0]
+    else:
+        extents = np.linalg.norm(half_sizes, axis=1)
+    return offsets, extents
+
+
+def grid_pairs(queries, query_reach, positions, reach):
+    """Returns (query index, position index) arrays of the queries and
+    positions closer than the sum of their reach"""
+    pairs = list(iter_grid_pairs(queries, query_reach, positions, reach))
+    if not pairs:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return (np.concatenate([query for query, _ in pairs]),
+            np.concatenate([found for _, found in pairs]))
+
+
+def iter_grid_pairs(queries, query_reach, positions, reach, live=None):
+    """Yields (query index, position index) arrays of the queries and
+    positions closer than the sum of their reach, one neighbour cell at a
+    time
+
+    Positions are bucketed into a grid of the largest possible reach sum
+    and every query only looks at its 27 neighbouring cells, nearest
+    first, found in a sorted table of the occupied cells. Queries cleared
+    in the live mask between yields are skipped from then on.
+    """
+    if len(queries) == 0 or len(positions) == 0:
+        return
+    low = np.minimum(queries.min(axis=0), positions.min(axis=0))
+    span = float((np.maximum(queries.max(axis=0), positions.max(axis=0))
+                  - low).max())
+    cell_size = max(float(query_reach.max()) + float(reach.max()),
+                    span / 2 ** 20, 1e-12)
+    keys = _cell_keys(positions, low, cell_size)
+    order = np.argsort(keys, kind="stable")
+    cell_keys, cell_starts, cell_counts = np.unique(
+        keys[order], return_index=True, return_counts=True)
+    query_order = np.argsort(_cell_keys(queries, low, cell_size),
+                             kind="stable")
+    query_keys = _cell_keys(queries[query_order], low, cell_size)
+    for x, y, z in NEIGHBOUR_OFFSETS:
+        if live is not None:
+            still_live = live[query_order]
+            query_order = query_order[still_live]
+            query_keys = query_keys[still_live]
+        neighbours = query_keys + ((x << 42) + (y << 21) + z)
+        cells = np.minimum(np.searchsorted(cell_keys, neighbours),
+                           len(cell_keys) - 1)
+        counts = np.where(cell_keys[cells] == neighbours,
+                          cell_counts[cells], 0)
+        query = np.repeat(query_order, counts)
+        found = order[np.arange(counts.sum())
+                      + np.repeat(cell_starts[cells] - np.cumsum(counts)
+                                  + counts, counts)]
+        deltas = queries[query] - positions[found]
+        close = (np.einsum("ij,ij->i", deltas, deltas)
+                 < (query_reach[query] + reach[found]) ** 2)
+        yield query[close], found[close]
+
+
+def _cell_keys(positions, low, cell_size):
+    cells = np.floor((positions - low) / cell_size).astype(np.int64) + 1
+    return (cells[:, 0] << 42) | (cells[:, 1] << 21) | cells[:, 2]
+
+
+def bound_fits(centers, extents, others, other_extents, boxes):
+    """Returns the largest factor each bound can scale by before it
+    overlaps the matching other bound"""
+    deltas = np.abs(centers - others)
+    if boxes:
+        return ((deltas - other_extents)
+                / np.maximum(extents, 1e-12)).max(axis=1)
+    return ((np.sqrt(np.einsum("ij,ij->i", deltas, deltas)) - other_extents)
+            / np.maximum(extents, 1e-12))
+
+
+def overlap_mask(translates, offsets, extents, boxes=False, min_factor=1.0):
+    """Returns a mask of instances kept by greedy overlap rejection and
+    the factor every instance is shrunk by
+
+    Instance bounds sit at translates plus offsets, with extents as
+    sphere radii or (N, 3) box half extents. The result is that of
+    visiting instances in order: one that overlaps an accepted instance
+    is shrunk about its translate until clear, and rejected when that
+    takes a factor below min_factor, so with min_factor 1 overlaps are
+    always rejected.
+
+    Instances are taken OVERLAP_BATCH at a time. A batch is first tested
+    against the instances accepted so far, then its survivors are paired
+    with each other and decided in vectorized rounds, each deciding every
+    instance whose overlapping predecessors are all decided.
+    """
+    count = len(translates)
+    keep = np.zeros(count, dtype=bool)
+    decided = np.zeros(count, dtype=bool)
+    factors = np.ones(count)
+    centers = translates + offsets
+    final_centers = centers.copy()
+    final_extents = extents.astype(np.float64)
+    reach = np.linalg.norm(offsets, axis=1) + (
+        np.linalg.norm(extents, axis=1) if boxes else extents)
+    for start in range(0, count, OVERLAP_BATCH):
+        batch = np.arange(start, min(start + OVERLAP_BATCH, count))
+        accepted = np.flatnonzero(keep)
+        fit = np.ones(len(batch))
+        clear = np.ones(len(batch), dtype=bool)
+        fixed_second, fixed_first = [], []
+        for query, found in iter_grid_pairs(
+                translates[batch], reach[batch], translates[accepted],
+                reach[accepted], clear):
+            np.minimum.at(fit, query, bound_fits(
+                centers[batch[query]], extents[batch[query]],
+                final_centers[accepted[found]],
+                final_extents[accepted[found]], boxes))
+            clear &= fit >= min_factor
+            fixed_second.append(batch[query])
+            fixed_first.append(accepted[found])
+        decided[batch[~clear]] = True
+        fixed_second = np.concatenate(fixed_second or [batch[:0]])
+        fixed_first = np.concatenate(fixed_first or [batch[:0]])
+        live = batch[clear]
+        live_fixed = ~decided[fixed_second]
+        pair_a, pair_b = grid_pairs(translates[live], reach[live],
+                                    translates[live], reach[live])
+        ahead = pair_a < pair_b
+        first = np.concatenate((fixed_first[live_fixed], live[pair_a[ahead]]))
+        second = np.concatenate((fixed_second[live_fixed],
+                                 live[pair_b[ahead]]))
+        if min_factor >= 1.0:
+            overlapping = bound_fits(centers[second], extents[second],
+                                     centers[first], extents[first],
+                                     boxes) < 1.0
+            first, second = first[overlapping], second[overlapping]
+        while not decided[batch].all():
+            active = ~decided[second]
+            first, second = first[active], second[active]
+            blocked = np.zeros(count, dtype=bool)
+            blocked[second[~decided[first]]] = True
+            ready = np.zeros(count, dtype=bool)
+            ready[batch] = ~decided[batch] & ~blocked[batch]
+            against = ready[second] & keep[first]
+            pair_first, pair_second = first[against], second[against]
+            fit = np.ones(count)
+            np.minimum.at(fit, pair_second, bound_fits(
+                centers[pair_second], extents[pair_second],
+                final_centers[pair_first], final_extents[pair_first], boxes))
+            accept = ready & (fit >= min_factor)
+            shrunk = accept & (fit < 1.0)
+            if shrunk.any():
+                final_centers[shrunk] = (translates[shrunk] + offsets[shrunk]
+                                         * fit[shrunk][:, np.newaxis])
+                final_extents[shrunk] = extents[shrunk] * (
+                    fit[shrunk][:, np.newaxis] if boxes else fit[shrunk])
+                check = shrunk[pair_second]
+                refit = np.ones(count)
+                np.minimum.at(refit, pair_second[check], bound_fits(
+                    final_centers[pair_second[check]],
+                    final_extents[pair_second[check]],
+                    final_centers[pair_first[check]],
+                    final_extents[pair_first[check]], boxes))
+                accept &= refit >= 1.0
+                factors[shrunk & accept] = fit[shrunk & accept]
+            keep |= accept
+            decided |= ready
+    return keep, factors
+
+
+def triangle_cumulative_areas(points, triangles):
+    """Returns the running sum of the areas of (T, 3) vertex id triangles"""
+    corners = points[triangles]
+    crosses = np.cross(corners[:, 1] - corners[:, 0],
+                       corners[:, 2] - corners[:, 0])
+    return np.cumsum(0.5 * np.linalg.norm(crosses, axis=1))
+
+
+def sample_surface_points(points, normals, triangles, cumulative_areas,
+                          count, rng):
+    """Returns count area-weighted random points, interpolated normals,
+    picked triangle indices and barycentric weights
+
+    Triangles are picked from the cumulative area table, then a uniform
+    barycentric point is drawn inside each one.
+    """
+    if count == 0 or len(triangles) == 0:
+        return (np.zeros((0, 3)), np.zeros((0, 3)),
+                np.zeros(0, dtype=np.int64), np.zeros((0, 3)))
+    picks = np.searchsorted(cumulative_areas,
+                            rng.uniform(0.0, cumulative_areas[-1], count),
+                            side="right")
+    picks = np.minimum(picks, len(triangles) - 1)
+    picked = triangles[picks]
+    u, v = rng.uniform(size=(2, count))
+    flip = u + v > 1.0
+    u[flip], v[flip] = 1.0 - u[flip], 1.0 - v[flip]
+    barycentrics = np.stack((1.0 - u - v, u, v), axis=1)
+    weights = barycentrics[:, :, np.newaxis]
+    positions = (points[picked] * weights).sum(axis=1)
+    blended = (normals[picked] * weights).sum(axis=1)
+    blended /= np.maximum(np.linalg.norm(blended, axis=1),
+                          1e-12)[:, np.newaxis]
+    return positions, blended, picks, barycentrics
+
+
+def minimum_spacing_mask(positions, radii):
+    """Returns a mask of points kept by greedy minimum distance rejection
+
+    Points are visited in order and rejected when an accepted point lies
+    closer than the mean of their two radii, which is overlap rejection
+    of spheres of half their radius.
+    """
+    return overlap_mask(positions, np.zeros_like(positions), 0.5 * radii)[0]
+
+
+def slab_order(positions):
+    """Returns the order of positions along their longest extent"""
+    if len(positions) == 0:
+        return np.zeros(0, dtype=np.int64)
+    axis = np.argmax(positions.max(axis=0) - positions.min(axis=0))
+    return np.argsort(positions[:, axis], kind="stable")
+
+
+def chunk_border_mask(positions, labels, cell_size):
+    """Returns a mask of points with a point of another chunk closer than
+    cell_size"""
+    border = np.zeros(len(positions), dtype=bool)
+    interior = np.ones(len(positions), dtype=bool)
+    reach = np.full(len(positions), 0.5 * cell_size)
+    for query, found in iter_grid_pairs(positions, reach, positions, reach,
+                                        interior):
+        border[query[labels[query] != labels[found]]] = True
+        np.logical_not(border, out=interior)
+    return border
+
+
+def planning_executor(workers):
+    """Returns a process pool for planning chunks
+
+    Inside an interactive Maya session sys.executable is the Maya binary,
+    so workers are started with the mayapy next to it instead.
+    """
+    context = multiprocessing.get_context("spawn")
+    executable = os.path.basename(sys.executable).lower()
+    if executable.startswith("maya") and \
+            not executable.startswith("mayapy"):
+        mayapy = os.path.join(os.path.dirname(sys.executable), "mayapy")
+        if sys.platform.startswith("win"):
+            mayapy += ".exe"
+        context.set_executable(mayapy)
+    return futures.ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=context)
+
+
+def sample_chunk(parameters, points, normals, triangles, seed):
+    """Samples one planning chunk in a worker process
+
+    The chunk is a self-contained mesh whose every vertex is a target.
+    Returns positions, normals, chunk vertex ids, scales, chunk triangle
+    indices and barycentric weights.
+    """
+    planner = ScatterPlanner()
+    planner.set_scatter_parameters(parameters)
+    planner.seed = seed
+    planner.target_points = points
+    planner.target_normals = normals
+    planner.target_triangles = triangles
+    planner.scatter_target_ids = np.arange(len(points), dtype=np.int64)
+    planner.seed_generators()
+    planner.sample_target()
+    return (planner.scatter_positions, planner.scatter_normals,
+            planner.scatter_vertex_ids, planner.scatter_scales,
+            planner.scatter_faces, planner.scatter_barycentrics)
+
+
+class ScatterPlanner(object):
+    """Plans scatter instance transforms from mesh arrays without Maya"""
+
+    def __init__(self):
+        self.scatter_x_min = 0
+        self.scatter_x_max = 0
+        self.scatter_y_min = 0
+        self.scatter_y_max = 0
+        self.scatter_z_min = 0
+        self.scatter_z_max = 0
+        self.scatter_scale_xmin = 0
+        self.scatter_scale_xmax = 0
+        self.scatter_scale_ymin = 0
+        self.scatter_scale_ymax = 0
+        self.scatter_scale_zmin = 0
+        self.scatter_scale_zmax = 0
+        self.scatter_percentage = 100
+        self.form_of_scatter = 0
+        self.obj_pos_offset = 0
+        self.sample_mode = "vertices"
+        self.surface_sample_count = 1000
+        self.min_spacing = 0
+        self.spacing_from_scale = False
+        self.seed = 0
+        self.planning_workers = 1
+        self.variant_weights = [1.0]
+        self.density_masks = []
+        self.overlap_mode = "none"
+        self.overlap_min_scale = 1.0
+        self.variant_bounds = np.zeros((1, 2, 3))
+        self.overlap_culled = 0
+        self.camera_padding = 0.0
+        self.camera_falloff = []
+        self.camera_frames = None
+        self.camera_views = []
+        self.camera_culled = 0
+        self.scatter_target_ids = np.zeros(0, dtype=np.int64)
+        self.target_points = np.zeros((0, 3))
+        self.target_normals = np.zeros((0, 3))
+        self.target_triangles = np.zeros((0, 3), dtype=np.int64)
+        self.target_colors = np.zeros((0, 4))
+        self.target_uvs = np.zeros((0, 2))
+        self.scatter_vertex_ids = np.zeros(0, dtype=np.int64)
+        self.scatter_faces = np.zeros(0, dtype=np.int64)
+        self.scatter_barycentrics = np.zeros((0, 3))
+        self.scatter_positions = np.zeros((0, 3))
+        self.scatter_normals = np.zeros((0, 3))
+        self.scatter_scales = np.zeros((0, 3))
+        self.sampling_rng = None
+        self.scale_rng = None
+        self.rotation_rng = None
+        self.variant_rng = None
+        self.mask_rng = None
+        self.camera_rng = None
+        self.profiler = None
+        self.plan_cache = PlanCache()
+        self.mesh_key = None
+        self.last_sample_key = None
+
+    def profile_phase(self, name):
+        """Returns a context manager timing name when profiling is on"""
+        if self.profiler is None:
+            return NULL_PHASE
+        return self.profiler.phase(name)
+
+    def plan_check(self):
+        """Returns True when the parameters can produce a scatter"""
+        if self.scatter_x_min > self.scatter_x_max or \
+                self.scatter_y_min > self.scatter_y_max or \
+                self.scatter_z_min > self.scatter_z_max or \
+                self.scatter_scale_xmin > self.scatter_scale_xmax or \
+                self.scatter_scale_ymin > self.scatter_scale_ymax or \
+                self.scatter_scale_zmin > self.scatter_scale_zmax:
+            log.warning("Minimum value(s) greater than maximum value(s). "
+                        "This is not valid. Resubmit values correctly.")
+            return False
+        weights = np.asarray(self.variant_weights, dtype=np.float64)
+        if len(weights) == 0 or np.any(weights < 0) or weights.sum() <= 0:
+            log.warning("Variant weights must be non-negative and add up to "
+                        "more than 0. Resubmit values correctly.")
+            return False
+        if self.overlap_mode not in OVERLAP_MODES or \
+                not 0 < self.overlap_min_scale <= 1:
+            log.warning("Overlap mode must be one of %s and the overlap "
+                        "minimum scale between 0 and 1. Resubmit values "
+                        "correctly.", ", ".join(OVERLAP_MODES))
+            return False
+        error = check_falloff(self.camera_falloff) or \
+            check_frames(self.camera_frames)
+        if error or self.camera_padding < 0:
+            log.warning("Camera %s. Resubmit values correctly.",
+                        error or "padding must not be negative")
+            return False
+        for mask in self.density_masks:
+            error = check_mask(mask)
+            if error:
+                log.warning("Density mask %s: %s. Resubmit values "
+                            "correctly.", mask, error)
+                return False
+        if self.sample_mode == "surface" and self.surface_sample_count == 0:
+            log.warning("Surface sample count set to 0, no points "
+                        "sampled. Specify a higher sample count.")
+            return False
+        if self.sample_mode != "surface" and self.scatter_percentage == 0:
+            log.warning("Percentage set to 0, no vertices randomly "
+                        "selected. Specify a higher percentage.")
+            return False
+        return True
+
+    def plan(self, points, normals, triangles=None):
+        """Returns a PLAN_DTYPE array of instances over the target mesh
+
+        points and normals are (V, 3) arrays indexed by vertex id and
+        triangles the (T, 3) triangulation, only needed for surface
+        sampling. Sampled points are reused from plan_cache while the
+        mesh and the sampling parameters are unchanged.
+        """
+        self.target_points = points
+        self.target_normals = normals
+        self.seed_generators()
+        if triangles is not None:
+            self.target_triangles = triangles
+        self.mesh_key = array_digest(points, self.target_triangles,
+                                     self.target_vertex_ids())
+        self.last_sample_key = "samples:{}:{}".format(
+            self.mesh_key, self.sampling_parameters())
+        cached = self.plan_cache.get(self.last_sample_key)
+        if cached is None:
+            if self.planning_chunk_count() > 1:
+                self.sample_target_chunked()
+            else:
+                self.sample_target()
+            self.plan_cache.put(self.last_sample_key,
+                                {"positions": self.scatter_positions,
+                                 "normals": self.scatter_normals,
+                                 "vertex_ids": self.scatter_vertex_ids,
+                                 "scales": self.scatter_scales,
+                                 "faces": self.scatter_faces,
+                                 "barycentrics": self.scatter_barycentrics})
+        else:
+            self.scatter_positions = cached["positions"]
+            self.scatter_normals = cached["normals"]
+            self.scatter_vertex_ids = cached["vertex_ids"]
+            self.scatter_scales = cached["scales"]
+            self.scatter_faces = cached["faces"]
+            self.scatter_barycentrics = cached["barycentrics"]
+        if self.density_masks:
+            with self.profile_phase("masks"):
+                self.apply_density_masks()
+        if not self.spacing_from_scale:
+            self.scatter_scales = self.create_scale_scatter_randomization(
+                len(self.scatter_positions))
+        with self.profile_phase("orientation"):
+            if self.form_of_scatter == 1:
+                translates, rotates = self.plan_object_align_normals()
+            elif self.form_of_scatter == 2:
+                translates, rotates = \
+                    self.plan_object_align_normals_and_rand_rotation()
+            else:
+                translates, rotates = self.plan_object()
+        variants = self.create_variant_randomization(len(translates))
+        plan = build_plan(translates, rotates, self.scatter_scales,
+                          self.scatter_normals, self.scatter_vertex_ids,
+                          variants, self.scatter_faces,
+                          self.scatter_barycentrics)
+        self.camera_culled = 0
+        if self.camera_views:
+            with self.profile_phase("camera"):
+                plan = self.cull_to_camera(plan)
+        self.overlap_culled = 0
+        if self.overlap_mode != "none":
+            with self.profile_phase("overlap"):
+                plan = self.reject_overlaps(plan)
+        return plan
+
+    def cull_to_camera(self, plan):
+        """Drops planned instances no camera view sees and thins the rest
+        by camera_falloff
+
+        Instances are kept when any of camera_views, one per frame of
+        camera_frames, has them in frame, and are thinned by their
+        distance to the nearest camera that does. Sets camera_culled to
+        the number of instances dropped.
+        """
+        keep, distances = camera_visibility(
+            plan["translate"], self.camera_views, float(self.camera_padding))
+        if len(self.camera_falloff):
+            keep &= (self.camera_rng.random(len(plan))
+                     < falloff_density(distances, self.camera_falloff))
+        self.keep_samples(keep)
+        self.camera_culled = int(len(plan) - keep.sum())
+        log.info("Camera culling dropped %d of %d instances.",
+                 self.camera_culled, len(plan))
+        return plan[keep]
+
+    def camera_frame_list(self):
+        """Returns the frames camera views are read on, None being the
+        current frame"""
+        if self.camera_frames is None:
+            return [None]
+        start, end = self.camera_frames[:2]
+        step = self.camera_frames[2] if len(self.camera_frames) > 2 else 1
+        return [float(frame)
+                for frame in np.arange(start, end + step * 0.5, step)]
+
+    def reject_overlaps(self, plan):
+        """Drops or shrinks planned instances whose bounds overlap
+
+        Bounds come from variant_bounds, the object space bounds of each
+        variant, and follow every instance's rotation and scale. Sets
+        overlap_culled to the number of instances dropped.
+        """
+        boxes = self.overlap_mode == "box"
+        offsets, extents = instance_bounds(plan, self.variant_bounds, boxes)
+        keep, factors = overlap_mask(plan["translate"], offsets, extents,
+                                     boxes, float(self.overlap_min_scale))
+        plan["scale"] *= factors[:, np.newaxis]
+        self.keep_samples(keep)
+        self.scatter_scales = plan["scale"][keep]
+        self.overlap_culled = int(len(plan) - keep.sum())
+        log.info("Overlap rejection culled %d of %d instances and shrank "
+                 "%d.", self.overlap_culled, len(plan),
+                 int(np.count_nonzero(factors[keep] < 1.0)))
+        return plan[keep]
+
+    def seed_generators(self):
+        """Creates independent sampling, scale, rotation, variant, mask and
+        camera generators
+
+        All of them derive from seed, so the same seed reproduces the same
+        layout, and changing only the scale or rotation ranges leaves the
+        sampled points untouched.
+        """
+        streams = np.random.SeedSequence(int(self.seed)).spawn(6)
+        self.sampling_rng, self.scale_rng, self.rotation_rng, \
+            self.variant_rng, self.mask_rng, self.camera_rng = [
+                np.random.default_rng(stream) for stream in streams]
+
+    def scatter_parameters(self):
+        """Returns the planning parameters as a plain dict"""
+        return dict((name, getattr(self, name))
+                    for name in PARAMETER_NAMES)
+
+    def set_scatter_parameters(self, parameters):
+        """Sets planning parameters from a dict such as scatter_parameters"""
+        for name, value in parameters.items():
+            if name not in PARAMETER_NAMES:
+                log.warning("Ignoring unknown scatter parameter %s", name)
+                continue
+            setattr(self, name, value)
+
+    def sample_target(self):
+        """Samples scatter points over the target and applies spacing
+
+        Scales are only drawn here when spacing depends on them.
+        """
+        with self.profile_phase("sampling"):
+            if self.sample_mode == "surface":
+                self.random_scatter_surface()
+            else:
+                self.random_scatter_vertices()
+            self.scatter_scales = np.zeros((0, 3))
+            if self.spacing_from_scale:
+                self.scatter_scales = \
+                    self.create_scale_scatter_randomization(
+                        len(self.scatter_positions))
+        if self.min_spacing > 0:
+            with self.profile_phase("spacing"):
+                self.apply_minimum_spacing()
+
+    def sample_target_chunked(self):
+        """Samples the target chunk by chunk, on a process pool of
+        planning_workers when there is more than one
+
+        The target is split into contiguous vertex or triangle chunks,
+        each sampled with its own seed derived from seed, and the results
+        are merged in chunk order. Minimum spacing runs inside every
+        chunk and once more over the merged survivors to catch points
+        that meet across chunk borders. The chunks do not depend on the
+        worker count, so neither does the result.
+        """
+        with self.profile_phase("sampling"):
+            chunks = self.planning_chunks()
+            seeds = np.random.SeedSequence(int(self.seed)).generate_state(
+                len(chunks))
+            arguments = [(parameters, points, normals, triangles, int(seed))
+                         for (parameters, points, normals, triangles, _, _),
+                         seed in zip(chunks, seeds)]
+            workers = int(self.planning_workers)
+            if workers > 1:
+                with planning_executor(workers) as executor:
+                    jobs = [executor.submit(sample_chunk, *chunk_arguments)
+                            for chunk_arguments in arguments]
+                    results = [job.result() for job in jobs]
+            else:
+                results = [sample_chunk(*chunk_arguments)
+                           for chunk_arguments in arguments]
+            self.scatter_positions = np.concatenate(
+                [result[0] for result in results])
+            self.scatter_normals = np.concatenate(
+                [result[1] for result in results])
+            self.scatter_vertex_ids = np.concatenate(
+                [chunk[4][result[2]] for chunk, result
+                 in zip(chunks, results)])
+            self.scatter_scales = np.concatenate(
+                [result[3] for result in results])
+            self.scatter_faces = np.concatenate(
+                [chunk[5][result[4]] for chunk, result
+                 in zip(chunks, results)])
+            self.scatter_barycentrics = np.concatenate(
+                [result[5] for result in results])
+            labels = np.concatenate([np.full(len(result[0]), index)
+                                     for index, result
+                                     in enumerate(results)])
+            if self.sample_mode == "surface":
+                self.scatter_vertex_ids = np.zeros(0, dtype=np.int64)
+        if self.min_spacing > 0:
+            with self.profile_phase("spacing"):
+                self.apply_minimum_spacing(labels)
+
+    def planning_chunk_count(self):
+        """Returns how many chunks of about PLANNING_CHUNK_VERTICES target
+        vertices the target is sampled in"""
+        return -(-len(self.target_vertex_ids()) // PLANNING_CHUNK_VERTICES)
+
+    def planning_chunks(self):
+        """Returns (parameters, points, normals, triangles, vertex ids,
+        triangle ids) sub-meshes splitting the target into
+        planning_chunk_count chunks
+
+        Chunks are slabs along the longest axis of the target, which keeps
+        the points near another chunk few.
+        """
+        parameters = self.scatter_parameters()
+        parameters["planning_workers"] = 1
+        chunk_count = self.planning_chunk_count()
+        chunks = []
+        if self.sample_mode == "surface":
+            triangle_ids = self.target_triangle_ids()
+            triangles = self.target_triangles[triangle_ids]
+            areas = np.diff(self.target_cumulative_areas(triangles),
+                            prepend=0.0)
+            splits = np.array_split(slab_order(
+                self.target_points[triangles].mean(axis=1)), chunk_count)
+            counts = self.sampling_rng.multinomial(
+                self.surface_sample_count,
+                [areas[split].sum() / max(areas.sum(), 1e-12)
+                 for split in splits])
+            for split, count in zip(splits, counts):
+                vertex_ids, local = np.unique(triangles[split],
+                                              return_inverse=True)
+                chunk_parameters = dict(parameters,
+                                        surface_sample_count=int(count))
+                chunks.append((chunk_parameters,
+                               self.target_points[vertex_ids],
+                               self.target_normals[vertex_ids],
+                               local.reshape(-1, 3), vertex_ids,
+                               triangle_ids[split]))
+        else:
+            target_ids = self.target_vertex_ids()
+            order = slab_order(self.target_points[target_ids])
+            for vertex_ids in np.array_split(target_ids[order],
+                                             chunk_count):
+                chunks.append((parameters, self.target_points[vertex_ids],
+                               self.target_normals[vertex_ids],
+                               np.zeros((0, 3), dtype=np.int64),
+                               vertex_ids, np.zeros(0, dtype=np.int64)))
+        return chunks
+
+    def sampling_parameters(self):
+        """Returns the parameters that change which points get sampled"""
+        parameters = [self.seed, self.sample_mode, self.scatter_percentage,
+                      self.surface_sample_count, self.min_spacing,
+                      self.spacing_from_scale]
+        if self.spacing_from_scale:
+            parameters.extend([self.scatter_scale_xmin,
+                               self.scatter_scale_xmax,
+                               self.scatter_scale_ymin,
+                               self.scatter_scale_ymax,
+                               self.scatter_scale_zmin,
+                               self.scatter_scale_zmax])
+        return repr(parameters)
+
+    def target_cumulative_areas(self, triangles):
+        """Returns the cumulative area table of triangles, cached per mesh"""
+        key = "areas:{}".format(self.mesh_key)
+        cached = self.plan_cache.get(key)
+        if cached is None:
+            cached = {"areas": triangle_cumulative_areas(self.target_points,
+                                                         triangles)}
+            self.plan_cache.put(key, cached)
+        return cached["areas"]
+
+    def plan_object(self):
+        translates = self.scatter_positions.copy()
+        translates[:, 1] += self.obj_pos_offset
+        rotates = self.create_rotation_scatter_randomization(len(translates))
+        return translates, rotates
+
+    def plan_object_align_normals(self):
+        translates = (self.scatter_positions
+                      + self.scatter_normals * self.obj_pos_offset)
+        rotates = normal_alignment_rotations(self.scatter_normals)
+        return translates, rotates
+
+    def plan_object_align_normals_and_rand_rotation(self):
+        translates = (self.scatter_positions
+                      + self.scatter_normals * self.obj_pos_offset)
+        spins = self.create_rotation_scatter_randomization(
+            len(translates))[:, 0]
+        rotates = normal_alignment_rotations(self.scatter_normals, spins)
+        return translates, rotates
+
+    def random_scatter_vertices(self):
+        vertex_ids = self.target_vertex_ids()
+        random_amount = int(round(len(vertex_ids)
+                                  * (self.scatter_percentage * 0.01)))
+        picked = self.sampling_rng.choice(len(vertex_ids), random_amount,
+                                          replace=False)
+        self.scatter_vertex_ids = vertex_ids[picked]
+        self.scatter_faces = np.zeros(0, dtype=np.int64)
+        self.scatter_barycentrics = np.zeros((0, 3))
+        self.scatter_positions = self.target_points[self.scatter_vertex_ids]
+        self.scatter_normals = self.target_normals[self.scatter_vertex_ids]
+
+    def random_scatter_surface(self):
+        """Samples points over the target triangles weighted by area"""
+        triangle_ids = self.target_triangle_ids()
+        triangles = self.target_triangles[triangle_ids]
+        cumulative_areas = self.target_cumulative_areas(triangles)
+        self.scatter_vertex_ids = np.zeros(0, dtype=np.int64)
+        self.scatter_positions, self.scatter_normals, picks, \
+            self.scatter_barycentrics = sample_surface_points(
+                self.target_points, self.target_normals, triangles,
+                cumulative_areas, self.surface_sample_count,
+                self.sampling_rng)
+        self.scatter_faces = triangle_ids[picks]
+
+    def target_triangle_ids(self):
+        """Returns the indices of the triangles whose vertices are all
+        target vertices"""
+        in_target = np.zeros(len(self.target_points), dtype=bool)
+        in_target[self.target_vertex_ids()] = True
+        return np.flatnonzero(in_target[self.target_triangles].all(axis=1))
+
+    def apply_minimum_spacing(self, labels=None):
+        """Drops sampled points that are closer than min_spacing
+
+        With chunk labels from parallel sampling, points are already
+        spaced within their chunk and only points near another chunk are
+        tested again.
+        """
+        radii = np.full(len(self.scatter_positions), float(self.min_spacing))
+        if self.spacing_from_scale:
+            radii *= self.scatter_scales.max(axis=1)
+        if labels is None:
+            keep = minimum_spacing_mask(self.scatter_positions, radii)
+        else:
+            keep = np.ones(len(radii), dtype=bool)
+            if len(radii):
+                border = chunk_border_mask(self.scatter_positions, labels,
+                                           max(float(radii.max()), 1e-12))
+                keep[border] = minimum_spacing_mask(
+                    self.scatter_positions[border], radii[border])
+        self.keep_samples(keep)
+
+    def apply_density_masks(self):
+        """Thins the sampled points by the density of density_masks
+
+        Each point survives with the chained density of the masks at it,
+        so masks can be tuned without resampling the target.
+        """
+        density = chain_density(self.density_masks, self)
+        self.keep_samples(
+            self.mask_rng.random(len(self.scatter_positions)) < density)
+
+    def keep_samples(self, keep):
+        """Drops the sampled points that keep masks out"""
+        kept = np.flatnonzero(keep)
+        self.scatter_positions = self.scatter_positions.take(kept, axis=0)
+        self.scatter_normals = self.scatter_normals.take(kept, axis=0)
+        if len(self.scatter_scales):
+            self.scatter_scales = self.scatter_scales.take(kept, axis=0)
+        if len(self.scatter_vertex_ids):
+            self.scatter_vertex_ids = self.scatter_vertex_ids.take(kept)
+        if len(self.scatter_faces):
+            self.scatter_faces = self.scatter_faces.take(kept)
+            self.scatter_barycentrics = self.scatter_barycentrics.take(
+                kept, axis=0)
+
+    def point_attribute(self, values):
+        """Returns per-vertex values interpolated at the sampled points
+
+        values is indexed by vertex id. Vertex samples take their own
+        vertex's value, surface samples blend the values of their
+        triangle's corners.
+        """
+        if self.sample_mode != "surface":
+            return values.take(self.scatter_vertex_ids, axis=0)
+        corners = np.ascontiguousarray(
+            self.target_triangles.take(self.scatter_faces, axis=0).T)
+        weights = np.ascontiguousarray(self.scatter_barycentrics.T)
+        columns = values.reshape(len(values), -1).T
+        blended = np.zeros((len(columns), len(self.scatter_faces)))
+        for column, result in zip(columns, blended):
+            column = np.ascontiguousarray(column)
+            for corner, weight in zip(corners, weights):
+                result += column.take(corner) * weight
+        return blended.T.reshape((-1,) + values.shape[1:])
+
+    def mask_texture(self, path):
+        """Returns the pixels of a density mask's texture file"""
+        return load_texture(path)
+
+    def target_vertex_ids(self):
+        """Returns the vertex ids of the target components as an array"""
+        return self.scatter_target_ids
+
+    def create_rotation_scatter_randomization(self, count):
+        """Returns a (count, 3) array of random XYZ rotations in degrees"""
+        return self.rotation_rng.uniform(
+            (self.scatter_x_min, self.scatter_y_min, self.scatter_z_min),
+            (self.scatter_x_max, self.scatter_y_max, self.scatter_z_max),
+            size=(count, 3))
+
+    def create_scale_scatter_randomization(self, count):
+        """Returns a (count, 3) array of random XYZ scale factors"""
+        return self.scale_rng.uniform(
+            (self.scatter_scale_xmin, self.scatter_scale_ymin,
+             self.scatter_scale_zmin),
+            (self.scatter_scale_xmax, self.scatter_scale_ymax,
+             self.scatter_scale_zmax),
+            size=(count, 3))
+
+    def create_variant_randomization(self, count):
+        """Returns a (count,) array of variant ids drawn by variant_weights"""
+        weights = np.asarray(self.variant_weights, dtype=np.float64)
+        return self.variant_rng.choice(len(weights), size=count,
+                                       p=weights / weights.sum())
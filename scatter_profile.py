@@ -0,0 +1,62 @@
+import collections
+import json
+import timeit
+
+
+class NullPhase(object):
+    """Context manager used for phases when profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class ScatterProfiler(object):
+    """Records wall time and backend call counts per scatter phase"""
+
+    def __init__(self, calls=None):
+        self.calls = collections.Counter() if calls is None else calls
+        self.phases = collections.OrderedDict()
+
+    def phase(self, name):
+        return _ProfiledPhase(self, name)
+
+    def record(self, name, seconds, calls):
+        entry = self.phases.setdefault(name, {"seconds": 0.0, "calls": {}})
+        entry["seconds"] += seconds
+        for call, count in calls.items():
+            entry["calls"][call] = entry["calls"].get(call, 0) + count
+
+    def summary(self):
+        return {"total_seconds": sum(entry["seconds"]
+                                     for entry in self.phases.values()),
+                "phases": self.phases}
+
+    def report(self):
+        return json.dumps(self.summary(), indent=2)
+
+
+class _ProfiledPhase(object):
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.calls_before = collections.Counter(self.profiler.calls)
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = timeit.default_timer() - self.start
+        calls = collections.Counter(self.profiler.calls)
+        calls.subtract(self.calls_before)
+        self.profiler.record(self.name, seconds,
+                             dict((call, count) for call, count
+                                  in calls.items() if count))
+        return False
@@ -0,0 +1,87 @@
+"""Undoable bulk scene edits
+
+API edits, such as MDagModifier.doIt() or MFnTransform writes, are not
+recorded on Maya's undo queue. run_undoable runs an operation through
+the scatterApply command, which this module registers when loaded as a
+plug-in, so the whole operation is undone and redone as one step along
+with the commands around it.
+
+An operation is any object with doIt and undoIt methods. doIt is called
+again on redo.
+"""
+import os
+import sys
+import types
+
+try:
+    import maya.cmds as cmds
+    import maya.api.OpenMaya as om
+except ImportError:
+    cmds = None
+    om = None
+
+COMMAND_NAME = "scatterApply"
+PLUGIN_NAME = "scatter_undo"
+
+# Loaded as a plug-in this file runs as a module of its own, separate
+# from the one the tool imports, so operations are handed to the command
+# through a module both can reach.
+_pending = sys.modules.setdefault(
+    "scatter_undo_pending", types.ModuleType("scatter_undo_pending"))
+if not hasattr(_pending, "operations"):
+    _pending.operations = []
+
+
+def maya_useNewAPI():
+    """Tells Maya the plug-in uses the Python API 2.0"""
+
+
+class ScatterApplyCommand(om.MPxCommand if om is not None else object):
+    """Runs the operation handed over by run_undoable as one undoable
+    step"""
+
+    def __init__(self):
+        super(ScatterApplyCommand, self).__init__()
+        self.operation = None
+
+    def doIt(self, args):
+        self.operation = _pending.operations.pop()
+        self.operation.doIt()
+
+    def redoIt(self):
+        self.operation.doIt()
+
+    def undoIt(self):
+        self.operation.undoIt()
+
+    def isUndoable(self):
+        return True
+
+    @staticmethod
+    def creator():
+        return ScatterApplyCommand()
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin).registerCommand(COMMAND_NAME,
+                                         ScatterApplyCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(COMMAND_NAME)
+
+
+def run_undoable(operation):
+    """Runs operation through the scatterApply command
+
+    The plug-in is loaded from this file the first time.
+    """
+    if not cmds.pluginInfo(PLUGIN_NAME, query=True, loaded=True):
+        cmds.loadPlugin(os.path.splitext(os.path.abspath(__file__))[0]
+                        + ".py", quiet=True)
+    _pending.operations.append(operation)
+    try:
+        getattr(cmds, COMMAND_NAME)()
+    finally:
+        if operation in _pending.operations:
+            _pending.operations.remove(operation)
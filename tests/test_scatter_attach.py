@@ -0,0 +1,101 @@
+import unittest
+
+import numpy as np
+
+from scatter_plan import euler_xyz_to_matrix
+from tests.test_scatter_object import grid_scatter
+
+
+def rotation_about_y(degrees):
+    """Returns the (3, 3) matrix rotating column vectors about world Y
+
+    Instance twist is measured from world Y, so this is the rotation that
+    carries whole instance frames along with the target.
+    """
+    angle = np.radians(degrees)
+    return np.array(((np.cos(angle), 0.0, np.sin(angle)),
+                     (0.0, 1.0, 0.0),
+                     (-np.sin(angle), 0.0, np.cos(angle))))
+
+
+def bent(points):
+    """Returns points and vertex normals of the grid bent along X"""
+    bent_points = points.copy()
+    bent_points[:, 1] += 0.01 * points[:, 0] ** 2
+    normals = np.stack((-0.02 * points[:, 0], np.ones(len(points)),
+                        np.zeros(len(points))), axis=1)
+    return bent_points, normals / np.linalg.norm(normals, axis=1)[:, None]
+
+
+class AttachmentTest(unittest.TestCase):
+
+    def scatter_for(self, **parameters):
+        settings = {"sample_mode": "surface", "surface_sample_count": 2000,
+                    "form_of_scatter": 2, "obj_pos_offset": 0.5}
+        settings.update(parameters)
+        scatter = grid_scatter(2500, **settings)
+        scatter.scatter_check()
+        return scatter
+
+    def test_undeformed_target_gives_back_the_plan(self):
+        for parameters in ({}, {"sample_mode": "vertices"},
+                           {"form_of_scatter": 0}):
+            scatter = self.scatter_for(**parameters)
+            plan = scatter.last_plan
+            translates, rotates, scales = scatter.attachment.transforms(
+                scatter.backend.points, scatter.backend.normals)
+            np.testing.assert_allclose(translates, plan["translate"],
+                                       atol=1e-9)
+            np.testing.assert_allclose(
+                euler_xyz_to_matrix(rotates),
+                euler_xyz_to_matrix(plan["rotate"]), atol=1e-9)
+            np.testing.assert_array_equal(scales, plan["scale"])
+
+    def test_instances_follow_a_rigid_motion(self):
+        scatter = self.scatter_for()
+        plan = scatter.last_plan
+        rotation = rotation_about_y(30)
+        points = scatter.backend.points.dot(rotation.T) + (1.0, 2.0, 3.0)
+        normals = scatter.backend.normals.dot(rotation.T)
+        translates, rotates, _ = scatter.attachment.transforms(points,
+                                                               normals)
+        np.testing.assert_allclose(
+            translates, plan["translate"].dot(rotation.T) + (1.0, 2.0, 3.0),
+            atol=1e-9)
+        np.testing.assert_allclose(
+            euler_xyz_to_matrix(rotates),
+            np.matmul(euler_xyz_to_matrix(plan["rotate"]), rotation.T),
+            atol=1e-9)
+
+    def test_update_follows_the_deformed_surface(self):
+        scatter = self.scatter_for(obj_pos_offset=0.0)
+        plan = scatter.last_plan
+        backend = scatter.backend
+        backend.points, backend.normals = bent(backend.points)
+        scatter.follow_target()
+        backend.change_time()
+        nodes, translates, rotates, _ = backend.transforms[-1]
+        self.assertEqual(nodes, scatter.scatter_instances)
+        corners = backend.points[backend.triangles[plan["face"]]]
+        np.testing.assert_allclose(
+            translates, np.einsum("nij,ni->nj", corners, plan["barycentric"]),
+            atol=1e-9)
+        blended = np.einsum("nij,ni->nj",
+                            backend.normals[backend.triangles[plan["face"]]],
+                            plan["barycentric"])
+        blended /= np.linalg.norm(blended, axis=1)[:, None]
+        np.testing.assert_allclose(euler_xyz_to_matrix(rotates)[:, 0],
+                                   blended, atol=1e-9)
+        scatter.follow_target(False)
+        self.assertEqual(len(backend.callbacks), 0)
+
+    def test_changed_vertex_count_is_not_updated(self):
+        scatter = self.scatter_for()
+        writes = len(scatter.backend.transforms)
+        scatter.backend.points = scatter.backend.points[:-1]
+        self.assertFalse(scatter.update_attached_instances())
+        self.assertEqual(len(scatter.backend.transforms), writes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+import scatter_batch
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+JOBS = [{"scene": "forest.ma", "target": "ground", "scatter_object": "tree",
+         "seed": 3},
+        {"scene": "rocks.ma", "target": "cliff",
+         "scatter_object": ["rock1", "rock2"], "variant_weights": [3, 1],
+         "parameters": {"scatter_percentage": 20}}]
+
+
+def fake_run_job(job, workers=1):
+    """Stands in for run_job, failing jobs on scenes named fail"""
+    status = "failed" if job["scene"].startswith("fail") else "ok"
+    return {"scene": job["scene"], "status": status, "workers": workers,
+            "seconds": 0.0}
+
+
+class LoadJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as job_file:
+            job_file.write(text)
+        return path
+
+    def test_json_list_and_mapping(self):
+        self.assertEqual(scatter_batch.load_jobs(
+            self.write("jobs.json", json.dumps(JOBS))), JOBS)
+        self.assertEqual(scatter_batch.load_jobs(
+            self.write("mapped.json", json.dumps({"jobs": JOBS}))), JOBS)
+
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_yaml_list_and_mapping(self):
+        self.assertEqual(scatter_batch.load_jobs(
+            self.write("jobs.yaml", yaml.safe_dump(JOBS))), JOBS)
+        self.assertEqual(scatter_batch.load_jobs(
+            self.write("jobs.yml", yaml.safe_dump({"jobs": JOBS}))), JOBS)
+
+
+class RunJobsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.jobs = JOBS + [{"scene": "fail.ma", "target": "ground",
+                             "scatter_object": "tree"}]
+        self.path = os.path.join(self.directory, "jobs.json")
+        with open(self.path, "w") as job_file:
+            json.dump(self.jobs, job_file)
+        maya = types.ModuleType("maya")
+        maya.standalone = mock.Mock()
+        self.modules = mock.patch.dict(sys.modules, {
+            "maya": maya, "maya.standalone": maya.standalone})
+        self.modules.start()
+        self.run_job = mock.patch.object(scatter_batch, "run_job",
+                                         side_effect=fake_run_job)
+        self.run_job.start()
+
+    def tearDown(self):
+        self.run_job.stop()
+        self.modules.stop()
+        shutil.rmtree(self.directory)
+
+    def test_summaries_in_job_order(self):
+        summaries = scatter_batch.run_jobs(self.path, workers=2)
+        self.assertEqual([summary["job"] for summary in summaries],
+                         [0, 1, 2])
+        self.assertEqual([summary["scene"] for summary in summaries],
+                         [job["scene"] for job in self.jobs])
+        self.assertEqual([summary["status"] for summary in summaries],
+                         ["ok", "ok", "failed"])
+        self.assertTrue(all(summary["workers"] == 2
+                            for summary in summaries))
+        scatter_batch.run_job.assert_has_calls(
+            [mock.call(job, 2) for job in self.jobs])
+
+    def test_job_index_runs_one_job(self):
+        summaries = scatter_batch.run_jobs(self.path, job_index=1)
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual(summaries[0]["job"], 1)
+        self.assertEqual(summaries[0]["scene"], "rocks.ma")
+
+    def test_processes_keep_job_order(self):
+        def run_job_process(job_path, index, workers):
+            summary = fake_run_job(self.jobs[index], workers)
+            summary["job"] = index
+            return summary
+        with mock.patch.object(scatter_batch, "run_job_process",
+                               side_effect=run_job_process):
+            summaries = scatter_batch.run_jobs(self.path, processes=3)
+        self.assertEqual([summary["job"] for summary in summaries],
+                         [0, 1, 2])
+        scatter_batch.run_job.assert_not_called()
+
+    def test_main_writes_report_and_fails_on_a_failed_job(self):
+        report = os.path.join(self.directory, "report.json")
+        self.assertEqual(scatter_batch.main([self.path, "--report", report]),
+                         1)
+        with open(report) as report_file:
+            self.assertEqual(len(json.load(report_file)), 3)
+        self.assertEqual(scatter_batch.main([self.path, "--job-index", "0"]),
+                         0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,21 @@
+import unittest
+
+from scatter_bench import benchmark_scatter
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_counts_every_planned_instance(self):
+        summary = benchmark_scatter(10000, scatter_percentage=50,
+                                    chunk_size=1000)
+        self.assertEqual(summary["vertices"], 10000)
+        self.assertAlmostEqual(summary["instances"], 5000, delta=50)
+        self.assertIn("phases", summary)
+
+    def test_empty_plan(self):
+        summary = benchmark_scatter(100, scatter_percentage=0.1)
+        self.assertEqual(summary["instances"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
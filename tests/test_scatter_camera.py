@@ -0,0 +1,128 @@
+import unittest
+
+import numpy as np
+
+from scatter_camera import (camera_visibility, check_falloff, check_frames,
+                            falloff_density, frustum_mask)
+from tests.test_scatter_object import grid_scatter
+
+
+def camera_view(position, yaw=0.0, tan_fov=(0.5, 0.5), near=0.1,
+                far=1000.0):
+    """Returns the view of a camera at position turned yaw degrees about
+    world Y, looking down -Z when yaw is 0"""
+    angle = np.radians(yaw)
+    world = np.eye(4)
+    world[:3, :3] = ((np.cos(angle), 0.0, -np.sin(angle)),
+                     (0.0, 1.0, 0.0),
+                     (np.sin(angle), 0.0, np.cos(angle)))
+    world[3, :3] = position
+    return {"matrix": np.linalg.inv(world), "tan_fov": tan_fov,
+            "near": near, "far": far}
+
+
+class FrustumTest(unittest.TestCase):
+
+    def test_frustum_and_clip_planes(self):
+        view = camera_view((0.0, 0.0, 0.0), near=1.0, far=50.0)
+        positions = np.array([(0, 0, -10), (4.9, 0, -10), (0, -5.1, -10),
+                              (0, 0, 10), (0, 0, -0.5), (0, 0, -60)],
+                             dtype=np.float64)
+        np.testing.assert_array_equal(frustum_mask(positions, view),
+                                      (1, 1, 0, 0, 0, 0))
+
+    def test_padding_widens_the_frame(self):
+        view = camera_view((1.0, 2.0, 3.0))
+        positions = np.array([(6.5, 2.0, -7.0), (1.0, 7.5, -7.0),
+                              (8.5, 2.0, -7.0)])
+        np.testing.assert_array_equal(frustum_mask(positions, view),
+                                      (0, 0, 0))
+        np.testing.assert_array_equal(frustum_mask(positions, view, 0.1),
+                                      (1, 1, 0))
+
+    def test_turned_camera(self):
+        view = camera_view((0.0, 0.0, 0.0), yaw=90)
+        positions = np.array([(-10, 0, 0), (10, 0, 0), (0, 0, -10)],
+                             dtype=np.float64)
+        np.testing.assert_array_equal(frustum_mask(positions, view),
+                                      (1, 0, 0))
+
+    def test_frames_see_the_union_from_the_nearest_camera(self):
+        views = [camera_view((0.0, 0.0, 0.0)),
+                 camera_view((0.0, 0.0, -30.0), yaw=180)]
+        positions = np.array([(0, 0, -5), (0, 0, -20), (0, 30, -15),
+                              (50, 0, -15)], dtype=np.float64)
+        visible, distances = camera_visibility(positions, views)
+        np.testing.assert_array_equal(visible, (1, 1, 0, 0))
+        np.testing.assert_allclose(distances, (5, 10, np.inf, np.inf))
+
+
+class FalloffTest(unittest.TestCase):
+
+    def test_density_interpolates_and_holds_at_the_ends(self):
+        falloff = [(10.0, 1.0), (20.0, 0.5), (40.0, 0.0)]
+        np.testing.assert_allclose(
+            falloff_density(np.array([0, 10, 15, 20, 30, 40, 100.0]),
+                            falloff), (1, 1, 0.75, 0.5, 0.25, 0, 0))
+
+    def test_checks(self):
+        self.assertIsNone(check_falloff([]))
+        self.assertIsNone(check_falloff([(0, 1), (10, 0)]))
+        for falloff in ([1, 2, 3], [(10, 1), (0, 0)], [(0, 1.5)]):
+            self.assertIsNotNone(check_falloff(falloff), falloff)
+        self.assertIsNone(check_frames(None))
+        self.assertIsNone(check_frames((1, 10, 2)))
+        for frames in ((1,), (10, 1), (1, 10, 0)):
+            self.assertIsNotNone(check_frames(frames), frames)
+
+
+class CameraCullingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.views = [camera_view((25.0, 0.0, 80.0), tan_fov=(0.2, 0.2)),
+                      camera_view((-40.0, 0.0, 10.0), yaw=-90,
+                                  tan_fov=(0.2, 0.2))]
+
+    def scatter_for(self, camera=None, **parameters):
+        scatter = grid_scatter(2500, seed=2, **parameters)
+        scatter.backend.cameras["persp"] = self.views
+        scatter.camera = camera
+        scatter.scatter_check()
+        return scatter
+
+    def test_keeps_what_any_frame_sees(self):
+        everything = self.scatter_for().last_plan
+        scatter = self.scatter_for("persp", camera_frames=[0, 1])
+        visible = camera_visibility(everything["translate"], self.views)[0]
+        self.assertTrue(0 < visible.sum() < len(everything))
+        np.testing.assert_array_equal(np.sort(scatter.last_plan["vertex"]),
+                                      np.sort(everything["vertex"][visible]))
+        self.assertEqual(scatter.camera_culled,
+                         len(everything) - visible.sum())
+        first = self.scatter_for("persp").last_plan
+        self.assertTrue(frustum_mask(first["translate"],
+                                     self.views[0]).all())
+        self.assertLess(len(first), len(scatter.last_plan))
+
+    def test_falloff_thins_with_distance(self):
+        plan = self.scatter_for("persp", camera_frames=[0, 1],
+                                camera_falloff=[[40.0, 1.0],
+                                                [80.0, 0.0]]).last_plan
+        distances = camera_visibility(plan["translate"], self.views)[1]
+        self.assertLess(distances.max(), 80.0)
+        everything = self.scatter_for("persp",
+                                      camera_frames=[0, 1]).last_plan
+        all_distances = camera_visibility(everything["translate"],
+                                          self.views)[1]
+        self.assertEqual(np.count_nonzero(distances < 40),
+                         np.count_nonzero(all_distances < 40))
+        near = np.count_nonzero((distances >= 40) & (distances < 50))
+        far = np.count_nonzero((distances >= 65) & (distances < 80))
+        self.assertGreater(near, 0.7 * np.count_nonzero(
+            (all_distances >= 40) & (all_distances < 50)))
+        self.assertLess(far, 0.4 * np.count_nonzero(
+            (all_distances >= 65) & (all_distances < 80)))
+
+
+if __name__ == "__main__":
+    unittest.main()
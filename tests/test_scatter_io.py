@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scatter_io import LAYOUT_DTYPE, plan_to_layout, read_layout, write_layout
+from scatter_plan import build_plan
+
+
+class LayoutRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "layout.scatter")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        rng = np.random.default_rng(0)
+        count = 1000
+        plan = build_plan(rng.random((count, 3)) * 100.0,
+                          rng.uniform(0, 360, (count, 3)),
+                          rng.uniform(0.5, 2.0, (count, 3)),
+                          rng.normal(size=(count, 3)),
+                          variants=rng.integers(0, 3, count))
+        settings = {"seed": 7, "scatter_target": "pMesh1"}
+        write_layout(self.path, plan, ["pRock1", "pRock2", "pRock3"],
+                     settings)
+        metadata, records = read_layout(self.path)
+        self.assertEqual(metadata["count"], count)
+        self.assertEqual(metadata["sources"], ["pRock1", "pRock2", "pRock3"])
+        self.assertEqual(metadata["settings"], settings)
+        self.assertEqual(records.dtype, LAYOUT_DTYPE)
+        self.assertIsInstance(records, np.memmap)
+        np.testing.assert_array_equal(records, plan_to_layout(plan))
+        for name in ("translate", "rotate", "scale"):
+            np.testing.assert_allclose(records[name], plan[name], rtol=1e-6)
+        np.testing.assert_array_equal(records["variant"], plan["variant"])
+        del records
+
+    def test_empty_round_trip(self):
+        write_layout(self.path, build_plan(np.zeros((0, 3)), np.zeros((0, 3)),
+                                           np.zeros((0, 3)),
+                                           np.zeros((0, 3))))
+        metadata, records = read_layout(self.path)
+        self.assertEqual(metadata["count"], 0)
+        self.assertEqual(len(records), 0)
+
+    def test_rejects_other_files(self):
+        with open(self.path, "wb") as other_file:
+            other_file.write(b"not a layout")
+        self.assertRaises(ValueError, read_layout, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
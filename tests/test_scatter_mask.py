@@ -0,0 +1,149 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scatter_bench import synthetic_grid
+from scatter_mask import (chain_density, check_mask, mask_density,
+                          range_density, value_noise)
+from scatter_plan import ScatterPlanner
+
+
+def vertex_planner(points, normals):
+    """Returns a planner whose samples are every vertex of points"""
+    planner = ScatterPlanner()
+    planner.target_points = points
+    planner.target_normals = normals
+    planner.scatter_target_ids = np.arange(len(points))
+    planner.scatter_vertex_ids = np.arange(len(points))
+    planner.scatter_positions = points
+    planner.scatter_normals = normals
+    return planner
+
+
+class RangeMaskTest(unittest.TestCase):
+
+    def test_range_density_ramps_over_falloff(self):
+        values = np.array([-3.0, -1.0, 0.0, 5.0, 10.0, 11.0, 13.0])
+        np.testing.assert_allclose(range_density(values, 0.0, 10.0, 2.0),
+                                   (0, 0.5, 1, 1, 1, 0.5, 0))
+        np.testing.assert_array_equal(range_density(values, 0.0, 10.0),
+                                      (0, 0, 1, 1, 1, 0, 0))
+
+    def test_slope(self):
+        angles = np.radians([0.0, 20.0, 40.0, 60.0])
+        normals = np.stack((np.sin(angles), np.cos(angles),
+                            np.zeros(4)), axis=1)
+        planner = vertex_planner(np.zeros((4, 3)), normals)
+        np.testing.assert_allclose(
+            mask_density({"type": "slope", "min": 0, "max": 30,
+                          "falloff": 20}, planner), (1, 1, 0.5, 0))
+
+    def test_height_and_invert(self):
+        points = np.zeros((4, 3))
+        points[:, 1] = (-1.0, 0.5, 2.0, 4.0)
+        planner = vertex_planner(points, np.tile((0, 1.0, 0), (4, 1)))
+        mask = {"type": "height", "min": 0, "max": 2}
+        np.testing.assert_array_equal(mask_density(mask, planner),
+                                      (0, 1, 1, 0))
+        mask["invert"] = True
+        np.testing.assert_array_equal(mask_density(mask, planner),
+                                      (1, 0, 0, 1))
+
+    def test_noise(self):
+        points = np.random.default_rng(0).random((5000, 3)) * 50.0
+        planner = vertex_planner(points, np.tile((0, 1.0, 0), (5000, 1)))
+        noise = value_noise(points, 10.0, 4)
+        self.assertTrue(np.all((noise >= 0) & (noise < 1)))
+        np.testing.assert_array_equal(noise, value_noise(points, 10.0, 4))
+        self.assertFalse(np.array_equal(noise, value_noise(points, 10.0, 5)))
+        nearby = value_noise(points + 0.01, 10.0, 4)
+        self.assertLess(np.abs(nearby - noise).max(), 0.05)
+        np.testing.assert_array_equal(
+            mask_density({"type": "noise", "size": 10.0, "seed": 4,
+                          "min": 0.5, "max": 1.0}, planner),
+            noise >= 0.5)
+
+
+class AttributeMaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.points, self.normals, self.triangles = synthetic_grid(100)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_vertex_color_on_vertices_and_surface(self):
+        planner = vertex_planner(self.points, self.normals)
+        colors = np.random.default_rng(1).random((len(self.points), 4))
+        planner.target_colors = colors
+        np.testing.assert_allclose(
+            mask_density({"type": "vertex_color", "channel": "g"}, planner),
+            colors[:, 1])
+        planner.sample_mode = "surface"
+        planner.target_triangles = self.triangles
+        planner.scatter_faces = np.array([0, 5])
+        planner.scatter_barycentrics = np.array([(1.0, 0.0, 0.0),
+                                                 (0.2, 0.3, 0.5)])
+        planner.scatter_positions = np.zeros((2, 3))
+        np.testing.assert_allclose(
+            mask_density({"type": "vertex_color", "channel": "a"}, planner),
+            [colors[self.triangles[0, 0], 3],
+             colors[self.triangles[5], 3].dot((0.2, 0.3, 0.5))])
+
+    def test_texture_uv_and_planar_projection(self):
+        path = os.path.join(self.directory, "mask.npy")
+        pixels = np.zeros((2, 2, 1), dtype=np.uint8)
+        pixels[0, 1] = 255
+        np.save(path, pixels)
+        planner = vertex_planner(self.points[:3], self.normals[:3])
+        planner.target_uvs = np.array([(0.75, 0.25), (0.25, 0.25),
+                                       (1.75, 0.25)])
+        mask = {"type": "texture", "path": path}
+        np.testing.assert_array_equal(mask_density(mask, planner), (1, 0, 1))
+        planner = vertex_planner(self.points, self.normals)
+        mask["projection"] = "planar"
+        expected = (self.points[:, 0] >= self.points[:, 0].max() / 2) & \
+            (self.points[:, 2] < self.points[:, 2].max() / 2)
+        np.testing.assert_array_equal(mask_density(mask, planner), expected)
+
+
+class ChainTest(unittest.TestCase):
+
+    def test_chained_masks_multiply(self):
+        points, normals, _ = synthetic_grid(2500)
+        planner = vertex_planner(points, normals)
+        masks = [{"type": "height", "min": -0.5, "max": 0.5, "falloff": 1},
+                 {"type": "noise", "size": 8.0, "min": 0.3, "max": 0.8,
+                  "falloff": 0.1},
+                 {"type": "slope", "max": 3, "falloff": 2, "invert": True}]
+        np.testing.assert_allclose(
+            chain_density(masks, planner),
+            np.prod([mask_density(mask, planner) for mask in masks], axis=0))
+        self.assertEqual(len(chain_density([], planner)), len(points))
+
+    def test_plan_thins_by_mask_density(self):
+        points, normals, _ = synthetic_grid(2500)
+        planner = ScatterPlanner()
+        planner.scatter_target_ids = np.arange(len(points))
+        planner.scatter_percentage = 100
+        planner.density_masks = [{"type": "height", "min": 0}]
+        plan = planner.plan(points, normals)
+        np.testing.assert_array_equal(np.sort(plan["vertex"]),
+                                      np.flatnonzero(points[:, 1] >= 0))
+
+    def test_check_mask(self):
+        self.assertIsNone(check_mask({"type": "slope", "max": 30}))
+        for mask in ({"type": "wind"}, {"type": "height", "min": 2, "max": 1},
+                     {"type": "slope", "falloff": -1},
+                     {"type": "noise", "size": 0},
+                     {"type": "vertex_color", "channel": "x"},
+                     {"type": "texture"}):
+            self.assertIsNotNone(check_mask(mask), mask)
+
+
+if __name__ == "__main__":
+    unittest.main()
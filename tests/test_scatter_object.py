@@ -0,0 +1,282 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scatter_backend import FakeBackend
+from scatter_bench import synthetic_grid
+from scatter_object import ScatterObject
+
+
+def grid_scatter(vertex_count, **parameters):
+    """Returns a ScatterObject over a synthetic grid on a FakeBackend"""
+    points, normals, triangles = synthetic_grid(vertex_count)
+    scatter = ScatterObject(FakeBackend(points, normals, triangles))
+    scatter.select_scatter_object()
+    scatter.select_target_object()
+    scatter.scatter_scale_xmin = scatter.scatter_scale_ymin = \
+        scatter.scatter_scale_zmin = 1.0
+    scatter.scatter_scale_xmax = scatter.scatter_scale_ymax = \
+        scatter.scatter_scale_zmax = 2.0
+    scatter.scatter_x_max = scatter.scatter_y_max = \
+        scatter.scatter_z_max = 360
+    scatter.scatter_percentage = 50
+    for name, value in parameters.items():
+        setattr(scatter, name, value)
+    return scatter
+
+
+class CallCountTest(unittest.TestCase):
+
+    def calls_for(self, vertex_count, **parameters):
+        scatter = grid_scatter(vertex_count, chunk_size=10 ** 6,
+                               **parameters)
+        scatter.scatter_check()
+        self.assertGreater(len(scatter.last_plan), 0)
+        return scatter.backend.calls
+
+    def test_calls_do_not_grow_with_instance_count(self):
+        for parameters in ({}, {"form_of_scatter": 1},
+                           {"form_of_scatter": 2},
+                           {"sample_mode": "surface",
+                            "surface_sample_count": 5000},
+                           {"output_mode": "instancer"}):
+            small = self.calls_for(100, **parameters)
+            large = self.calls_for(10000, **parameters)
+            self.assertEqual(small, large, parameters)
+
+    def test_writes_every_instance_once(self):
+        scatter = grid_scatter(2500, chunk_size=10 ** 6)
+        scatter.scatter_check()
+        nodes, translates, rotates, scales = scatter.backend.transforms[-1]
+        self.assertEqual(len(nodes), len(scatter.last_plan))
+        np.testing.assert_array_equal(translates,
+                                      scatter.last_plan["translate"])
+        np.testing.assert_array_equal(rotates, scatter.last_plan["rotate"])
+        np.testing.assert_array_equal(scales, scatter.last_plan["scale"])
+
+
+class VariantTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scatter = grid_scatter(10000, chunk_size=1000,
+                                    scatter_percentage=100)
+        self.scatter.set_scatter_variants(["pRock1", "pRock2", "pTree1"],
+                                          [1, 2, 7])
+        self.scatter.scatter_check()
+        self.plan = self.scatter.last_plan
+
+    def test_variant_frequencies_follow_the_weights(self):
+        frequencies = np.bincount(self.plan["variant"], minlength=3) / \
+            float(len(self.plan))
+        np.testing.assert_allclose(frequencies, (0.1, 0.2, 0.7), atol=0.02)
+
+    def test_one_creation_per_variant_per_chunk(self):
+        chunks = [self.plan["variant"][start:start + 1000]
+                  for start in range(0, len(self.plan), 1000)]
+        self.assertEqual(self.scatter.backend.calls["create_instances"],
+                         sum(len(np.unique(chunk)) for chunk in chunks))
+        self.assertEqual(self.scatter.backend.calls["set_transforms"],
+                         self.scatter.backend.calls["create_instances"])
+
+    def test_instances_are_their_planned_variant(self):
+        sources = np.array(self.scatter.scatter_variants)
+        for node, source in zip(self.scatter.scatter_instances,
+                                sources[self.plan["variant"]]):
+            self.assertIn("|{}_instance".format(source), node)
+        self.assertEqual(len(set(self.scatter.scatter_instances)),
+                         len(self.plan))
+        written = {}
+        for nodes, translates, _, _ in self.scatter.backend.transforms:
+            written.update(zip(nodes, translates))
+        np.testing.assert_array_equal(
+            [written[node] for node in self.scatter.scatter_instances],
+            self.plan["translate"])
+
+
+class InstancerTest(unittest.TestCase):
+
+    def test_one_instancer_holds_every_instance(self):
+        scatter = grid_scatter(2500, output_mode="instancer")
+        scatter.scatter_check()
+        backend = scatter.backend
+        self.assertEqual(backend.calls["create_instancer"], 1)
+        self.assertEqual(backend.calls["create_instances"], 0)
+        self.assertEqual(len(scatter.scatter_instances), 1)
+        self.assertEqual(backend.nodes[scatter.scatter_group]["children"],
+                         scatter.scatter_instances)
+        _, translates, rotates, scales = backend.transforms[-1]
+        np.testing.assert_array_equal(translates,
+                                      scatter.last_plan["translate"])
+        np.testing.assert_array_equal(rotates, scatter.last_plan["rotate"])
+        np.testing.assert_array_equal(scales, scatter.last_plan["scale"])
+
+
+class SeedTest(unittest.TestCase):
+
+    def plan_for(self, seed, **parameters):
+        scatter = grid_scatter(2500, seed=seed, **parameters)
+        scatter.scatter_check()
+        return scatter.last_plan
+
+    def test_same_seed_gives_same_plan(self):
+        for parameters in ({}, {"sample_mode": "surface",
+                                "surface_sample_count": 2000,
+                                "form_of_scatter": 2, "min_spacing": 1.0}):
+            np.testing.assert_array_equal(self.plan_for(4, **parameters),
+                                          self.plan_for(4, **parameters))
+            self.assertFalse(np.array_equal(self.plan_for(4, **parameters),
+                                            self.plan_for(5, **parameters)))
+
+    def test_stored_settings_regenerate_the_scatter(self):
+        scatter = grid_scatter(2500, seed=9)
+        scatter.set_target("pMesh1", np.arange(500, 2000))
+        scatter.scatter_check()
+        restored = ScatterObject(scatter.backend)
+        restored.set_target("pMesh1", np.arange(10))
+        self.assertTrue(restored.load_scatter_settings(scatter.scatter_group))
+        np.testing.assert_array_equal(restored.scatter_target_ids,
+                                      np.arange(500, 2000))
+        restored.scatter_check()
+        np.testing.assert_array_equal(restored.last_plan, scatter.last_plan)
+
+
+class RescatterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scatter = grid_scatter(2500, chunk_size=200)
+        self.scatter.scatter_check()
+        self.backend = self.scatter.backend
+        self.group = self.scatter.scatter_group
+        self.instances = list(self.scatter.scatter_instances)
+        self.plan = self.scatter.last_plan
+        self.key = self.scatter.applied_scatter_key
+        self.attachment = self.scatter.attachment
+
+    def assert_previous_scatter(self):
+        self.assertEqual(self.scatter.scatter_group, self.group)
+        self.assertEqual(self.scatter.scatter_instances, self.instances)
+        self.assertIs(self.scatter.last_plan, self.plan)
+        self.assertEqual(self.scatter.applied_scatter_key, self.key)
+        self.assertIs(self.scatter.attachment, self.attachment)
+        self.assertIn(self.group, self.backend.nodes)
+
+    def test_scale_change_rewrites_instances_in_place(self):
+        self.scatter.scatter_scale_xmax = 3.0
+        self.scatter.scatter_check()
+        self.assertEqual(self.scatter.scatter_group, self.group)
+        self.assertEqual(self.backend.calls["group"], 1)
+        chunks = -(-len(self.plan) // 200)
+        self.assertEqual(self.backend.calls["scatterApply"], chunks)
+        self.assertEqual(self.backend.calls["read_transforms"],
+                         len(self.plan))
+        nodes, _, _, scales = self.backend.transforms[-1]
+        self.assertEqual(nodes, self.scatter.scatter_instances[-len(nodes):])
+        np.testing.assert_array_equal(
+            scales, self.scatter.last_plan["scale"][-len(nodes):])
+        np.testing.assert_array_equal(self.scatter.last_plan["translate"],
+                                      self.plan["translate"])
+
+    def test_sampling_change_creates_new_group(self):
+        self.scatter.seed = 1
+        self.scatter.scatter_check()
+        self.assertNotEqual(self.scatter.scatter_group, self.group)
+        self.assertIn(self.group, self.backend.nodes)
+
+    def test_variant_change_is_not_updated_in_place(self):
+        plan = self.plan.copy()
+        self.assertTrue(self.scatter.can_update_in_place(plan))
+        plan["variant"][0] = 1
+        self.assertFalse(self.scatter.can_update_in_place(plan))
+
+    def test_cancelled_in_place_rescatter_keeps_previous_scatter(self):
+        settings = self.backend.scatter_settings(self.group)
+        self.scatter.obj_pos_offset = 2.0
+        chunks = self.scatter.scatter_chunks()
+        next(chunks)
+        chunks.close()
+        self.scatter.cancel_scatter()
+        self.assert_previous_scatter()
+        self.assertEqual(self.scatter.obj_pos_offset, 0)
+        self.assertEqual(self.backend.scatter_settings(self.group), settings)
+        nodes, translates, _, _ = self.backend.transforms[-1]
+        np.testing.assert_array_equal(
+            translates, self.plan["translate"][:len(nodes)])
+
+    def test_cancelled_new_scatter_deletes_only_its_group(self):
+        self.scatter.seed = 1
+        chunks = self.scatter.scatter_chunks()
+        next(chunks)
+        new_group = self.scatter.scatter_group
+        chunks.close()
+        self.scatter.cancel_scatter()
+        self.assertNotIn(new_group, self.backend.nodes)
+        self.assert_previous_scatter()
+        self.assertEqual(self.scatter.seed, 0)
+        self.scatter.scatter_scale_xmax = 3.0
+        self.scatter.scatter_check()
+        self.assertEqual(self.scatter.scatter_group, self.group)
+
+
+class ImportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "layout.scatter")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_imported_layout_is_not_rewritten_in_place(self):
+        scatter = grid_scatter(2500)
+        scatter.scatter_check()
+        scatter.export_layout(self.path)
+        scatter.scatter_x_max = 90
+        imported = scatter.import_layout(self.path)
+        settings = json.loads(scatter.backend.scatter_settings(imported))
+        self.assertEqual(settings["scatter_x_max"], 360)
+        self.assertEqual(len(scatter.backend.nodes[imported]["children"]),
+                         len(scatter.last_plan))
+        scatter.scatter_check()
+        self.assertNotEqual(scatter.scatter_group, imported)
+
+
+def node_set(backend):
+    """Returns every node of backend with its children and settings"""
+    return dict((node, (list(attrs["children"]),
+                        attrs.get("scatterSettings")))
+                for node, attrs in backend.nodes.items())
+
+
+class UndoTest(unittest.TestCase):
+
+    def test_undo_removes_a_scatter(self):
+        scatter = grid_scatter(2500, chunk_size=100)
+        scatter.scatter_check()
+        self.assertGreater(len(scatter.scatter_instances), 100)
+        scatter.backend.undo()
+        self.assertEqual(node_set(scatter.backend), {})
+        self.assertEqual(scatter.backend.undo_queue, [])
+
+    def test_undo_restores_the_previous_scatter(self):
+        scatter = grid_scatter(2500, chunk_size=100)
+        scatter.scatter_check()
+        before = node_set(scatter.backend)
+        scatter.scatter_percentage = 20
+        scatter.scatter_check()
+        self.assertNotEqual(node_set(scatter.backend), before)
+        scatter.backend.undo()
+        self.assertEqual(node_set(scatter.backend), before)
+
+    def test_undo_removes_an_instancer(self):
+        scatter = grid_scatter(2500, output_mode="instancer")
+        scatter.scatter_check()
+        scatter.backend.undo()
+        self.assertEqual(node_set(scatter.backend), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,271 @@
+import unittest
+
+import numpy as np
+
+import scatter_plan
+from scatter_bench import synthetic_grid
+from scatter_plan import (ScatterPlanner, chunk_border_mask,
+                          euler_xyz_to_matrix, minimum_spacing_mask,
+                          normal_alignment_rotations, overlap_mask,
+                          sample_surface_points, triangle_cumulative_areas)
+
+
+def sequential_overlap_mask(translates, offsets, extents, boxes, min_factor):
+    """Visits instances one at a time against every accepted instance"""
+    keep = np.zeros(len(translates), dtype=bool)
+    factors = np.ones(len(translates))
+    accepted = []
+
+    def fit(center, extent):
+        fits = [1.0]
+        for other, other_extent in accepted:
+            delta = np.abs(center - other)
+            if boxes:
+                fits.append(((delta - other_extent)
+                             / np.maximum(extent, 1e-12)).max())
+            else:
+                fits.append((np.linalg.norm(delta) - other_extent)
+                            / max(extent, 1e-12))
+        return min(fits)
+
+    for index in range(len(translates)):
+        center = translates[index] + offsets[index]
+        extent = extents[index]
+        factor = fit(center, extent)
+        if factor < 1.0:
+            if factor < min_factor:
+                continue
+            center = translates[index] + offsets[index] * factor
+            extent = extent * factor
+            if fit(center, extent) < 1.0:
+                continue
+            factors[index] = factor
+        keep[index] = True
+        accepted.append((center, extent))
+    return keep, factors
+
+
+class NormalAlignmentTest(unittest.TestCase):
+    """Orientation of a default normalConstraint: aim X, up Y, world up Y"""
+
+    def alignment(self, normals, spins=None):
+        matrices = euler_xyz_to_matrix(
+            normal_alignment_rotations(normals, spins))
+        np.testing.assert_allclose(
+            np.matmul(matrices, matrices.transpose(0, 2, 1)),
+            np.tile(np.eye(3), (len(normals), 1, 1)), atol=1e-9)
+        np.testing.assert_allclose(np.linalg.det(matrices), 1.0, atol=1e-9)
+        unit = normals / np.linalg.norm(normals, axis=1)[:, np.newaxis]
+        np.testing.assert_allclose(matrices[:, 0], unit, atol=1e-9)
+        return matrices, unit
+
+    def projected_world_up(self, unit):
+        up = np.array([0.0, 1.0, 0.0]) - unit[:, 1:2] * unit
+        return up / np.linalg.norm(up, axis=1)[:, np.newaxis]
+
+    def test_up_follows_world_up_for_tilted_normals(self):
+        normals = np.random.default_rng(0).normal(size=(1000, 3))
+        matrices, unit = self.alignment(normals)
+        np.testing.assert_allclose(matrices[:, 1],
+                                   self.projected_world_up(unit), atol=1e-9)
+
+    def test_spin_turns_up_around_the_normal(self):
+        normals = np.random.default_rng(1).normal(size=(1000, 3))
+        spins = np.random.default_rng(2).uniform(0, 360, len(normals))
+        matrices, unit = self.alignment(normals, spins)
+        up = self.projected_world_up(unit)
+        angles = np.degrees(np.arctan2(
+            np.einsum("ij,ij->i", np.cross(up, matrices[:, 1]), unit),
+            np.einsum("ij,ij->i", up, matrices[:, 1])))
+        np.testing.assert_allclose(np.mod(angles - spins + 180, 360) - 180,
+                                   0.0, atol=1e-6)
+
+    def test_gimbal_normals(self):
+        normals = np.array([(0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1),
+                            (1e-9, 1, 0), (0, 1e-9, -1), (2, 0, 0)],
+                           dtype=np.float64)
+        self.alignment(normals)
+        self.alignment(normals, np.full(len(normals), 45.0))
+        matrices, unit = self.alignment(normals[2:4])
+        np.testing.assert_allclose(matrices[:, 1], [(0, 1, 0), (0, 1, 0)],
+                                   atol=1e-9)
+
+    def test_upright_normal_is_unrotated(self):
+        rotates = normal_alignment_rotations(np.array([(1.0, 0.0, 0.0)]))
+        np.testing.assert_allclose(rotates, 0.0, atol=1e-9)
+
+
+class SurfaceSamplingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.points = np.array([(0, 0, 0), (1, 0, 0), (0, 2, 0),
+                                (5, 0, 0), (7, 0, 0), (5, 2, 0),
+                                (10, 0, 0), (15, 0, 0), (10, 2, 0),
+                                (20, 0, 0), (21, 0, 0), (22, 0, 0)],
+                               dtype=np.float64)
+        self.normals = np.tile((0.0, 0.0, 1.0), (len(self.points), 1))
+        self.triangles = np.arange(12).reshape(4, 3)
+
+    def sample(self, count, seed=0):
+        return sample_surface_points(
+            self.points, self.normals, self.triangles,
+            triangle_cumulative_areas(self.points, self.triangles), count,
+            np.random.default_rng(seed))
+
+    def test_triangles_are_picked_by_area(self):
+        count = 80000
+        positions, normals, picks, barycentrics = self.sample(count)
+        frequencies = np.bincount(picks, minlength=4) / float(count)
+        np.testing.assert_allclose(frequencies, (1 / 8., 2 / 8., 5 / 8., 0),
+                                   atol=0.01)
+        corners = self.points[self.triangles[picks]]
+        np.testing.assert_allclose(
+            positions, np.einsum("nij,ni->nj", corners, barycentrics))
+        self.assertTrue(np.all(barycentrics >= 0))
+        np.testing.assert_allclose(barycentrics.sum(axis=1), 1.0)
+        np.testing.assert_allclose(normals,
+                                   np.tile((0.0, 0.0, 1.0), (count, 1)))
+
+    def test_points_are_uniform_inside_a_triangle(self):
+        positions = self.sample(80000)[0]
+        first = positions[positions[:, 0] < 1.5]
+        self.assertAlmostEqual(np.mean(first[:, 0] < 0.5), 0.75, delta=0.01)
+        self.assertAlmostEqual(np.mean(first[:, 1] < 1.0), 0.75, delta=0.01)
+
+    def test_samples_only_triangles_inside_the_target(self):
+        points, normals, triangles = synthetic_grid(2500)
+        planner = ScatterPlanner()
+        planner.sample_mode = "surface"
+        planner.surface_sample_count = 5000
+        planner.scatter_target_ids = np.flatnonzero(points[:, 0] < 20)
+        plan = planner.plan(points, normals, triangles)
+        self.assertEqual(len(plan), 5000)
+        self.assertTrue(np.all(points[triangles[plan["face"]]][..., 0] < 20))
+        self.assertLess(plan["translate"][:, 0].max(), 19.0 + 1e-9)
+
+
+class OverlapMaskTest(unittest.TestCase):
+
+    def setUp(self):
+        self.batch = scatter_plan.OVERLAP_BATCH
+        scatter_plan.OVERLAP_BATCH = 64
+        self.rng = np.random.default_rng(3)
+
+    def tearDown(self):
+        scatter_plan.OVERLAP_BATCH = self.batch
+
+    def random_instances(self, count, boxes):
+        translates = self.rng.random((count, 3)) * 20.0
+        offsets = self.rng.normal(scale=0.2, size=(count, 3))
+        if boxes:
+            extents = self.rng.uniform(0.2, 1.5, (count, 3))
+        else:
+            extents = self.rng.uniform(0.2, 1.5, count)
+        return translates, offsets, extents
+
+    def test_matches_sequential_rejection(self):
+        for boxes in (False, True):
+            for min_factor in (1.0, 0.5):
+                translates, offsets, extents = self.random_instances(
+                    500, boxes)
+                keep, factors = overlap_mask(translates, offsets, extents,
+                                             boxes, min_factor)
+                expected_keep, expected_factors = sequential_overlap_mask(
+                    translates, offsets, extents, boxes, min_factor)
+                np.testing.assert_array_equal(keep, expected_keep)
+                np.testing.assert_allclose(factors[keep],
+                                           expected_factors[keep])
+
+    def test_empty(self):
+        keep, factors = overlap_mask(np.zeros((0, 3)), np.zeros((0, 3)),
+                                     np.zeros(0))
+        self.assertEqual(len(keep), 0)
+        self.assertEqual(len(factors), 0)
+
+
+class MinimumSpacingTest(unittest.TestCase):
+
+    def test_matches_sequential_rejection(self):
+        rng = np.random.default_rng(0)
+        positions = rng.random((500, 3)) * 10.0
+        radii = rng.uniform(0.5, 1.5, 500)
+        expected = np.zeros(len(positions), dtype=bool)
+        for index in range(len(positions)):
+            accepted = np.flatnonzero(expected)
+            distances = np.linalg.norm(positions[accepted]
+                                       - positions[index], axis=1)
+            expected[index] = np.all(
+                distances >= 0.5 * (radii[accepted] + radii[index]))
+        np.testing.assert_array_equal(minimum_spacing_mask(positions, radii),
+                                      expected)
+
+    def test_empty(self):
+        self.assertEqual(len(minimum_spacing_mask(np.zeros((0, 3)),
+                                                  np.zeros(0))), 0)
+
+
+class ChunkBorderTest(unittest.TestCase):
+
+    def test_marks_points_near_another_chunk(self):
+        rng = np.random.default_rng(1)
+        positions = rng.random((2000, 3)) * 20.0
+        labels = (positions[:, 0] > 10.0).astype(np.int64) + \
+            2 * (positions[:, 2] > 7.0)
+        distances = np.linalg.norm(positions[:, np.newaxis]
+                                   - positions[np.newaxis], axis=2)
+        expected = np.any((distances < 1.5)
+                          & (labels[:, np.newaxis] != labels[np.newaxis]),
+                          axis=1)
+        np.testing.assert_array_equal(
+            chunk_border_mask(positions, labels, 1.5), expected)
+
+
+class ChunkedPlanningTest(unittest.TestCase):
+    """Planning in chunks with chunk sizes small enough for a test mesh"""
+
+    def setUp(self):
+        self.chunk_vertices = scatter_plan.PLANNING_CHUNK_VERTICES
+        scatter_plan.PLANNING_CHUNK_VERTICES = 600
+        self.points, self.normals, self.triangles = synthetic_grid(2500)
+
+    def tearDown(self):
+        scatter_plan.PLANNING_CHUNK_VERTICES = self.chunk_vertices
+
+    def plan_for(self, workers, seed=3, **parameters):
+        planner = ScatterPlanner()
+        planner.scatter_target_ids = np.arange(len(self.points))
+        planner.scatter_percentage = 60
+        planner.min_spacing = 1.5
+        planner.seed = seed
+        planner.planning_workers = workers
+        for name, value in parameters.items():
+            setattr(planner, name, value)
+        plan = planner.plan(self.points, self.normals, self.triangles)
+        return plan, planner
+
+    def assert_spaced(self, plan, spacing):
+        positions = plan["translate"]
+        distances = np.linalg.norm(
+            positions[:, np.newaxis] - positions[np.newaxis], axis=2)
+        np.fill_diagonal(distances, np.inf)
+        self.assertGreaterEqual(distances.min(), spacing)
+
+    def test_chunks_do_not_depend_on_workers(self):
+        for parameters in ({}, {"sample_mode": "surface",
+                                "surface_sample_count": 1500}):
+            serial, planner = self.plan_for(1, **parameters)
+            self.assertEqual(planner.planning_chunk_count(), 5)
+            parallel, parallel_planner = self.plan_for(2, **parameters)
+            np.testing.assert_array_equal(serial, parallel)
+            self.assertEqual(planner.last_sample_key,
+                             parallel_planner.last_sample_key)
+            self.assert_spaced(serial, 1.5)
+
+    def test_same_seed_gives_same_plan(self):
+        plan, _ = self.plan_for(1)
+        np.testing.assert_array_equal(plan, self.plan_for(1)[0])
+        self.assertFalse(np.array_equal(plan, self.plan_for(1, seed=4)[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()